@@ -0,0 +1,353 @@
+""" Time SvgTurtle primitives and the game drawings, without a display.
+
+Results are written as JSON, so runs from different commits can be
+compared. For example:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --filter zola --sizes 6,50
+
+Add --imports to also check that each game module imports quickly, without
+side effects or heavy optional dependencies. The exit status is 1 if any
+game breaks that budget.
+"""
+import json
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+from timeit import Timer
+
+from quarto.svg_turtle import SvgOptimizer, SvgTurtle
+
+# {name: (function, default_sizes)}
+BENCHMARKS = {}
+
+# Each game is a module with the same name as its folder.
+GAMES = ('quarto',
+         'hanoi',
+         'zola',
+         'monkey_queen',
+         'plank',
+         'gamutile',
+         'palago',
+         'dominoes')
+
+# Optional dependencies that games should only import when they use them.
+HEAVY_MODULES = ('matplotlib',
+                 'cairosvg',
+                 'cairo',
+                 'numpy',
+                 'space_tracer',
+                 'svgwrite',
+                 'concurrent.futures.process')
+
+# Runs in a fresh interpreter, with the game's folder first on the path, like
+# running the game's script.
+IMPORT_SCRIPT = """\
+import sys
+from time import perf_counter
+sys.path.insert(0, {folder!r})
+start = perf_counter()
+import {name}
+print(perf_counter() - start)
+print(' '.join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def benchmark(*sizes):
+    """ Register a benchmark function that draws with one size parameter.
+
+    The function should return the turtle it drew with, so its stats can be
+    reported, or None.
+    """
+    def register(function):
+        BENCHMARKS[function.__name__] = (function, sizes)
+        return function
+    return register
+
+
+def create_turtle(width=400, height=400):
+    return SvgTurtle.create(width, height, stats=True)
+
+
+@benchmark(100, 1000, 10000)
+def forward(count):
+    t = create_turtle()
+    for _ in range(count):
+        t.forward(50)
+        t.left(91)
+    t.to_svg()
+    return t
+
+
+@benchmark(6, 60, 360)
+def circle_steps(steps):
+    t = create_turtle()
+    for _ in range(10):
+        t.circle(100, steps=steps)
+        t.left(36)
+    t.to_svg()
+    return t
+
+
+@benchmark(10, 100, 1000)
+def fill(count):
+    t = create_turtle()
+    t.fillcolor('ivory')
+    for _ in range(count):
+        t.begin_fill()
+        for _ in range(4):
+            t.forward(20)
+            t.left(90)
+        t.end_fill()
+        t.left(7)
+    t.to_svg()
+    return t
+
+
+@benchmark(100, 1000, 10000)
+def dot(count):
+    t = create_turtle()
+    for i in range(count):
+        t.dot(i % 20 + 1)
+        t.forward(3)
+        t.left(13)
+    t.to_svg()
+    return t
+
+
+@benchmark(100, 1000, 10000)
+def polyline(count):
+    t = create_turtle()
+    t.polyline([(i % 100 - 50, i*7 % 100 - 50) for i in range(count)])
+    t.to_svg()
+    return t
+
+
+@benchmark(10, 100, 1000)
+def write(count):
+    t = create_turtle()
+    for i in range(count):
+        t.write(str(i), align='center', font=('Arial', 10, 'normal'))
+        t.forward(3)
+        t.left(13)
+    t.to_svg()
+    return t
+
+
+@benchmark(1)
+def quarto_set(count):
+    """ Draw the pieces, board, and icon like quarto's main(). """
+    from quarto import quarto
+
+    optimizer = SvgOptimizer()
+    t = None
+    for _ in range(count):
+        for name, flags in quarto.generate_flags():
+            t = create_turtle(*quarto.PIECE_CANVAS)
+            quarto.draw_centred_piece(t, flags)
+            t.to_svg(optimizer)
+        t = create_turtle(172, 172)
+        quarto.draw_board(t, 170)
+        t.to_svg(optimizer)
+        t = create_turtle(32, 32)
+        quarto.draw_icon(t, 30)
+        t.to_svg(optimizer)
+    return t
+
+
+@benchmark(3, 6, 12, 25, 50)
+def hanoi_board(n):
+    from hanoi.hanoi import HanoiBoard
+
+    t = create_turtle(172, 172)
+    HanoiBoard(t, n, 0.55 * 170).draw()
+    t.to_svg()
+    return t
+
+
+@benchmark(6, 12, 25, 50)
+def zola_board(n):
+    from zola.zola import ZolaBoard
+
+    t = create_turtle(172, 172)
+    ZolaBoard(t, n, 170).draw()
+    t.to_svg()
+    return t
+
+
+@benchmark(6, 12, 25, 50)
+def monkey_queen_board(n):
+    from monkey_queen.monkey_queen import MonkeyQueenBoard
+
+    t = create_turtle(172, 172)
+    MonkeyQueenBoard(t, n, 170).draw()
+    t.to_svg()
+    return t
+
+
+@benchmark(1)
+def plank_set(count):
+    """ Draw the planks, pieces, and icon like plank's main(). """
+    from plank import plank
+
+    optimizer = SvgOptimizer()
+    t = None
+    for _ in range(count):
+        for colour_num in range(3):
+            t = create_turtle(*plank.PLANK_CANVAS)
+            plank.draw_centred_plank(t, colour_num)
+            t.to_svg(optimizer)
+            for side_count in (3, 4, 6, None):
+                t = create_turtle(*plank.PIECE_CANVAS)
+                plank.draw_centred_piece(t, colour_num, side_count)
+                t.to_svg(optimizer)
+        t = create_turtle(32, 32)
+        plank.PlankSet(t, 10).draw_icon()
+        t.to_svg(optimizer)
+    return t
+
+
+@benchmark(50, 100, 200)
+def gamutile_tile(r):
+    from gamutile.gamutile import build_tile
+
+    for combo in ('AAA', 'AaB', 'Aae'):
+        build_tile(combo, r)
+
+
+def run_benchmark(name, size, repeat):
+    function, _ = BENCHMARKS[name]
+    turtles = []
+    times = Timer(lambda: turtles.append(function(size))).repeat(repeat,
+                                                                 number=1)
+    result = dict(name=name,
+                  size=size,
+                  repeat=repeat,
+                  best=min(times),
+                  median=median(times))
+    turtle = turtles[-1]
+    if turtle is not None:
+        # Stats only cover the last turtle that the function drew with.
+        result['stats'] = turtle.stats.as_dict()
+    return result
+
+
+def time_import(name, repeat, budget):
+    """ Time importing a game module in fresh interpreters.
+
+    :param name: the game's module and folder name
+    :param repeat: number of interpreters to start
+    :param budget: maximum seconds that the best import may take
+    :return: a dict with the timing, any heavy modules that were imported,
+        any other output from the import, and whether the import passed, or
+        with the error if the import failed
+    """
+    root = Path(__file__).parent
+    script = IMPORT_SCRIPT.format(folder=str(root / name),
+                                  name=name,
+                                  heavy_modules=HEAVY_MODULES)
+    times = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-c', script],
+                                 cwd=root,
+                                 capture_output=True,
+                                 text=True)
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1]
+            return dict(name=name, error=error, passed=False)
+        *printed, seconds, heavy_modules = process.stdout.split('\n')[:-1]
+        times.append(float(seconds))
+    heavy_modules = heavy_modules.split()
+    best = min(times)
+    return dict(name=name,
+                repeat=repeat,
+                best=best,
+                median=median(times),
+                budget=budget,
+                heavy_modules=heavy_modules,
+                output=printed,
+                passed=best <= budget and not heavy_modules and not printed)
+
+
+def find_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=Path(__file__).parent,
+                              capture_output=True,
+                              text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = ArgumentParser(description=__doc__.splitlines()[0],
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--output',
+                        help='JSON file to write, instead of standard out')
+    parser.add_argument('--filter',
+                        default='',
+                        help='only run benchmarks with this in their names')
+    parser.add_argument('--sizes',
+                        help='comma-separated sizes to replace the defaults')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=5,
+                        help='number of times to time each benchmark')
+    parser.add_argument('--imports',
+                        action='store_true',
+                        help='also time importing each game module')
+    parser.add_argument('--import-budget',
+                        type=float,
+                        default=0.15,
+                        help='maximum seconds to import a game module')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = args.sizes and [int(size) for size in args.sizes.split(',')]
+    results = []
+    for name, (_, default_sizes) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        for size in sizes or default_sizes:
+            result = run_benchmark(name, size, args.repeat)
+            print('{name}({size}): {best:.4f}s'.format(**result),
+                  file=sys.stderr)
+            results.append(result)
+    report = dict(commit=find_commit(),
+                  created=datetime.now(timezone.utc).isoformat(),
+                  python=platform.python_version(),
+                  platform=platform.platform(),
+                  results=results)
+    failures = []
+    if args.imports:
+        report['imports'] = imports = []
+        for name in GAMES:
+            if args.filter not in name:
+                continue
+            result = time_import(name, args.repeat, args.import_budget)
+            if 'error' in result:
+                message = 'import {name}: {error}'
+            else:
+                message = 'import {name}: {best:.4f}s'
+            print(message.format(**result), file=sys.stderr)
+            imports.append(result)
+            if not result['passed']:
+                failures.append(result['name'])
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        Path(args.output).write_text(text + '\n')
+    if failures:
+        sys.exit('Game imports failed the budget: ' + ', '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+""" Build every game's generated files, skipping the ones that are current.
+
+Each game's script runs in its own folder, like running it by hand, with
+the repository on the Python path. Games that don't depend on each other's
+files run at the same time. For example:
+
+    python -m build_all
+    python -m build_all gamutile palago --jobs 2
+"""
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+from pathlib import Path
+from time import perf_counter
+
+from quarto.build_cache import BuildCache, FORCE_VARIABLE
+
+ROOT = Path(__file__).parent
+
+# Paths are glob patterns relative to ROOT. Every node also depends on its
+# script and the shared modules.
+Node = namedtuple('Node', 'name script inputs outputs')
+
+SHARED_SOURCES = ('quarto/svg_turtle.py',
+                  'quarto/palette.py',
+                  'quarto/build_cache.py',
+                  'quarto/parallel.py')
+PACKAGES = ('svgwrite', 'cairosvg', 'Pillow')
+
+NODES = (Node('quarto',
+              'quarto/quarto.py',
+              inputs=(),
+              outputs=('quarto/quarto*.svg', 'quarto/quarto_icon.png')),
+         Node('hanoi',
+              'hanoi/hanoi.py',
+              inputs=(),
+              outputs=('hanoi/hanoi_*.svg', 'hanoi/hanoi_icon.png')),
+         Node('zola',
+              'zola/zola.py',
+              inputs=(),
+              outputs=('zola/zola_*.svg', 'zola/zola_icon.png')),
+         Node('monkey_queen',
+              'monkey_queen/monkey_queen.py',
+              inputs=(),
+              outputs=('monkey_queen/monkey_queen_*.svg',
+                       'monkey_queen/monkey_queen_icon.png')),
+         Node('plank',
+              'plank/plank.py',
+              inputs=(),
+              outputs=('plank/plank_*.svg',
+                       'plank/piece_*.svg',
+                       'plank/plank_icon.png')),
+         Node('gamutile',
+              'gamutile/gamutile.py',
+              inputs=('gamutile/*.json',),
+              outputs=('gamutile/gamutile-*.png', 'gamutile/gamutile*.pcio')),
+         Node('palago',
+              'palago/palago.py',
+              inputs=('palago/*.json', 'palago/*.png'),
+              outputs=('palago/palago*.pcio',)),
+         Node('dominoes',
+              'dominoes/dominoes.py',
+              inputs=('dominoes/*.json', 'dominoes/tetrominoes.py'),
+              outputs=('dominoes/dominoes.pcio',)),
+         Node('print_and_play',
+              'print_and_play.py',
+              inputs=('quarto/quarto.py', 'hanoi/hanoi.py', 'plank/plank.py'),
+              outputs=('print_and_play.pdf',)))
+
+
+def find_paths(patterns) -> list:
+    """ List the files that match glob patterns, in a stable order.
+
+    Hidden files, like the games' own build caches, never match.
+    """
+    return sorted({path
+                   for pattern in patterns
+                   for path in ROOT.glob(pattern)
+                   if not path.name.startswith('.')})
+
+
+def find_dependencies(nodes) -> dict:
+    """ Find the nodes whose outputs each node reads.
+
+    :return: {name: {names of nodes that must build first}}
+    """
+    dependencies = {}
+    for node in nodes:
+        input_names = [path.relative_to(ROOT).as_posix()
+                       for path in find_paths(node.inputs)]
+        input_names.extend(node.inputs)
+        dependencies[node.name] = {
+            other.name
+            for other in nodes
+            if other is not node and any(fnmatch(input_name, pattern)
+                                         for input_name in input_names
+                                         for pattern in other.outputs)}
+    return dependencies
+
+
+def sort_nodes(nodes, dependencies) -> list:
+    """ Order nodes so each one comes after the nodes it depends on. """
+    ordered = []
+    remaining = list(nodes)
+    while remaining:
+        done = {node.name for node in ordered}
+        ready = [node
+                 for node in remaining
+                 if dependencies[node.name] <= done]
+        if not ready:
+            raise ValueError('Dependency cycle between ' +
+                             ', '.join(node.name for node in remaining))
+        ordered.extend(ready)
+        remaining = [node for node in remaining if node not in ready]
+    return ordered
+
+
+def find_key(cache: BuildCache, node: Node) -> str:
+    sources = [node.script, *SHARED_SOURCES]
+    return cache.find_key(node.name,
+                          inputs=find_paths(sources) + find_paths(node.inputs))
+
+
+def find_recorded(cache: BuildCache, node: Node) -> set:
+    """ Find the names of the outputs that a node built last time. """
+    return {name
+            for name in cache.manifest
+            if any(fnmatch(name, pattern) for pattern in node.outputs)}
+
+
+def is_current(cache: BuildCache, node: Node, key: str) -> bool:
+    """ Check that a node's outputs are the ones it last built, with a key.
+
+    A missing output or one that wasn't recorded makes the node stale.
+    """
+    outputs = find_paths(node.outputs)
+    names = {path.relative_to(ROOT).as_posix() for path in outputs}
+    if not outputs or names != find_recorded(cache, node):
+        return False
+    return cache.is_current(outputs, key)
+
+
+def record(cache: BuildCache, node: Node, key: str):
+    """ Record the outputs that a node built, and forget any old ones. """
+    for name in find_recorded(cache, node):
+        del cache.manifest[name]
+    cache.record(find_paths(node.outputs), key)
+
+
+def run_node(node: Node, force=False):
+    """ Run a node's script in its folder.
+
+    :param force: True if the script should rebuild all its files, instead
+        of skipping the ones its own build cache says are current
+    :return: (completed_process, seconds)
+    """
+    start_time = perf_counter()
+    script = ROOT / node.script
+    python_path = [str(ROOT)]
+    if os.environ.get('PYTHONPATH'):
+        python_path.append(os.environ['PYTHONPATH'])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(python_path))
+    if force:
+        env[FORCE_VARIABLE] = '1'
+    process = subprocess.run([sys.executable, script.name],
+                             cwd=script.parent,
+                             env=env,
+                             capture_output=True,
+                             text=True)
+    return process, perf_counter() - start_time
+
+
+def build(names=(), jobs=None, force=False) -> bool:
+    """ Build the stale nodes, running independent ones at the same time.
+
+    :param names: names of the nodes to build, along with the nodes they
+        depend on, or empty to build them all
+    :param jobs: the number of scripts to run at once, or None for one per
+        CPU
+    :param force: True if every node should run and rebuild all its files,
+        even if they're current
+    :return: True if every node that ran succeeded
+    """
+    dependencies = find_dependencies(NODES)
+    wanted = set(names or (node.name for node in NODES))
+    unknown = wanted - set(dependencies)
+    if unknown:
+        raise ValueError('Unknown nodes: ' + ', '.join(sorted(unknown)))
+    while True:
+        upstream = set().union(*(dependencies[name] for name in wanted))
+        if upstream <= wanted:
+            break
+        wanted |= upstream
+    nodes = sort_nodes([node for node in NODES if node.name in wanted],
+                       dependencies)
+    cache = BuildCache(ROOT / '.build_cache.json', packages=PACKAGES)
+    waiting = list(nodes)
+    done = set()
+    failed = set()
+    running = {}  # {future: (node, key)}
+    with ThreadPoolExecutor(jobs or os.cpu_count() or 1) as executor:
+        while waiting or running:
+            for node in list(waiting):
+                node_dependencies = dependencies[node.name]
+                if node_dependencies & failed:
+                    print(f'{node.name}: skipped after a failed dependency.')
+                    failed.add(node.name)
+                    waiting.remove(node)
+                elif node_dependencies <= done:
+                    waiting.remove(node)
+                    key = find_key(cache, node)
+                    if not force and is_current(cache, node, key):
+                        print(f'{node.name}: current.')
+                        done.add(node.name)
+                        continue
+                    future = executor.submit(run_node, node, force)
+                    running[future] = (node, key)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node, key = running.pop(future)
+                process, seconds = future.result()
+                if process.returncode != 0:
+                    print(f'{node.name}: failed after {seconds:.1f}s.')
+                    print(process.stderr, end='', file=sys.stderr)
+                    failed.add(node.name)
+                    continue
+                print(f'{node.name}: built in {seconds:.1f}s.')
+                # Record the key from before the build, so inputs that
+                # changed during the build make the node stale next time.
+                record(cache, node, key)
+                cache.save()
+                done.add(node.name)
+    return not failed
+
+
+def parse_args():
+    parser = ArgumentParser(description=__doc__.splitlines()[0],
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('names',
+                        nargs='*',
+                        metavar='name',
+                        help='nodes to build, from: ' +
+                        ', '.join(node.name for node in NODES))
+    parser.add_argument('--jobs',
+                        type=int,
+                        help='scripts to run at once, instead of one per CPU')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='rebuild every file, even if it is current')
+    args = parser.parse_args()
+    unknown = set(args.names) - {node.name for node in NODES}
+    if unknown:
+        parser.error('unknown names: ' + ', '.join(sorted(unknown)))
+    return args
+
+
+def main():
+    args = parse_args()
+    start_time = perf_counter()
+    is_successful = build(args.names, args.jobs, args.force)
+    print(f'Finished in {perf_counter() - start_time:.1f}s.')
+    if not is_successful:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -95,4 +95,5 @@ def main():
             zf.writestr('userassets/' + name, f.getvalue())
 
 
-main()
+if __name__ == '__main__':
+    main()
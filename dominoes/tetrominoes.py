@@ -1,5 +1,4 @@
 from PIL import Image, ImageDraw
-from space_tracer import LivePillowImage
 
 
 def draw_tetromino(letter: str, colour: str) -> Image.Image:
@@ -37,6 +36,8 @@ def draw_tetromino(letter: str, colour: str) -> Image.Image:
 
 
 def demo() -> None:
+    from space_tracer import LivePillowImage
+
     image = draw_tetromino('I', 'cornsilk')
     live_image = LivePillowImage(image)
     live_image.display()
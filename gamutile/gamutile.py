@@ -7,7 +7,9 @@ from zipfile import ZipFile
 
 from PIL import Image, ImageDraw, ImageColor
 from PIL.ImageDraw import floodfill
-from space_tracer import LivePillowImage
+
+from quarto.build_cache import BuildCache
+from quarto.parallel import run_jobs
 
 # {code: (colour, size)}
 OPTIONS = {'A': ('red', 0),
@@ -147,19 +149,44 @@ def generate_combinations(colours: str) -> typing.List[str]:
     return sorted(combinations)
 
 
-def generate_tiles(combinations):
-    size = 400
-    for combo in combinations:
+def save_tile(combo: str, size: int):
+    """ Save a tile image in the current folder, possibly in a worker process.
+
+    :param combo: the tile's code, or 'back' for the back of the tiles
+    :param size: width of the image before it's rotated
+    """
+    if combo == 'back':
+        image = build_back(size / 2)
+    else:
         image = build_tile(combo, size / 2)
-        image = image.rotate(90, expand=True)
-        image.save(f'gamutile-{combo}.png')
-    image = build_back(size / 2)
     image = image.rotate(90, expand=True)
-    image.save(f'gamutile-back.png')
-    print(f'Generated {len(combinations)} tiles.')
+    image.save(f'gamutile-{combo}.png')
+
+
+def generate_tiles(combinations,
+                   cache: BuildCache = None,
+                   processes: int = None):
+    """ Save tile images in the current folder.
+
+    :param combinations: codes for the tiles to generate
+    :param cache: skips tiles that haven't changed, or None to generate all
+    :param processes: the number of worker processes, None for one per CPU,
+        or 1 to draw all the tiles in this process.
+    """
+    size = 400
+    jobs = [(save_tile, (combo, size))
+            for combo in combinations + ['back']
+            if cache is None or cache.needs_build(f'gamutile-{combo}.png',
+                                                  combo,
+                                                  size)]
+    run_jobs(jobs, processes)
+    tile_count = sum(combo != 'back' for _, (combo, _) in jobs)
+    print(f'Generated {tile_count} tiles.')
 
 
 def demo_main():
+    from space_tracer import LivePillowImage
+
     size = 400
     image = build_tile('Aae', size / 2)
     live_image = LivePillowImage(image)
@@ -167,13 +194,24 @@ def demo_main():
 
 
 # noinspection DuplicatedCode
-def main():
-    combinations = list(generate_combinations('AaeBbc'))
-    generate_tiles(combinations)
+def main(processes: int = None):
+    """ Generate the tile images and the archives that use them.
 
+    :param processes: the number of worker processes for the tiles, None for
+        one per CPU, or 1 to draw them all in this process.
+    """
     folder_path = Path(__file__).parent
-    button = loads((folder_path/'button.json').read_text())
-    deck = loads((folder_path/'deck1.json').read_text())
+    cache = BuildCache(folder_path / '.build_cache.json',
+                       sources=(main,),
+                       packages=('Pillow',))
+    combinations = list(generate_combinations('AaeBbc'))
+    generate_tiles(combinations, cache, processes)
+
+    template_paths = [folder_path/'button.json', folder_path/'deck1.json']
+    image_paths = [f'gamutile-{combo}.png'
+                   for combo in combinations + ['back']]
+    button = loads(template_paths[0].read_text())
+    deck = loads(template_paths[1].read_text())
     all_widgets = []
     all_widgets.extend(deck)
     all_widgets.append(button)
@@ -213,11 +251,16 @@ def main():
 
     for name, widgets in (('gamutile.pcio', all_widgets),
                           ('gamutile-hex-hex.pcio', widgets_hex_hex)):
+        if not cache.needs_build(folder_path/name,
+                                 combinations,
+                                 inputs=template_paths + image_paths):
+            continue
         with ZipFile(folder_path/name, 'w') as zf:
             zf.writestr('widgets.json', dumps(widgets))
-            for combo in combinations + ['back']:
-                zf.write(f'gamutile-{combo}.png',
-                         f'userassets/gamutile-{combo}.png')
+            for image_path in image_paths:
+                zf.write(image_path, 'userassets/' + image_path)
+    cache.save()
+    print(cache.report())
 
 
 if __name__ == '__live_coding__':
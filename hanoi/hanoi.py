@@ -4,8 +4,11 @@ from math import sqrt, ceil
 from pathlib import Path
 from turtle import Turtle
 
-from cairosvg import svg2png
-from quarto.svg_turtle import SvgTurtle
+from quarto.build_cache import svg_build
+from quarto.parallel import run_jobs
+from quarto.svg_turtle import SvgTurtle, save_svg
+
+PIECE_CANVAS = (500, 500)  # (width, height) of each piece's file, in pixels
 
 
 class HanoiBoard:
@@ -95,38 +98,55 @@ def demo():
     piece.draw()
 
 
-def main():
+def draw_centred_piece(turtle: Turtle, colour: str, rank: int):
+    """ Draw a piece in the middle of a PIECE_CANVAS canvas. """
+    piece = HanoiPiece(turtle, colour, rank, round(PIECE_CANVAS[0]/6))
+    piece.draw()
+
+
+def main(processes: int = 1):
+    """ Generate all the images.
+
+    :param processes: the number of worker processes, or None for one per CPU
+    """
     output_path = Path(__file__).parent
-    board_path = output_path / 'hanoi_board.svg'
-    size = 170
-    turtle = SvgTurtle.create("172px", "172px")
-    board = HanoiBoard(turtle, 3, 0.55 * size)
-    board.draw()
-    turtle.save_as(board_path)
-
-    for colour, suffix in (('cornflower blue', 'b'), ('ivory', 'w')):
-        for rank in range(1, 6):
-            turtle = SvgTurtle.create("500px", "500px")
-            size = 500
-            piece_path = output_path / f'hanoi_piece_{suffix}{rank}.svg'
-            piece = HanoiPiece(turtle, colour, rank, round(size/6))
-            piece.draw()
-            turtle.save_as(piece_path)
+    with svg_build(output_path, main) as (cache, optimizer):
+        board_path = output_path / 'hanoi_board.svg'
+        size = 170
+        if cache.needs_build(board_path, size):
+            turtle = SvgTurtle.create("172px", "172px")
+            board = HanoiBoard(turtle, 3, 0.55 * size)
+            board.draw()
+            turtle.save_as(board_path, optimizer=optimizer)
 
-    icon_svg_path = output_path / 'hanoi_icon.svg'
-    icon_png_path = output_path / 'hanoi_icon.png'
-    size = round(32*0.6)
-    turtle = SvgTurtle.create("32px", "32px")
-    board = HanoiBoard(turtle, 2, size)
-    board.draw()
-    scale = round(board.radius / 4)
-    piece = HanoiPiece(turtle, 'cornflower blue', size=2, scale=scale)
-    piece.draw()
-    turtle.forward(board.radius * sqrt(3))
-    piece = HanoiPiece(turtle, 'ivory', size=3, scale=scale)
-    piece.draw()
-    turtle.save_as(icon_svg_path)
-    svg2png(icon_svg_path.read_text(), write_to=str(icon_png_path))
+        jobs = []
+        for colour, suffix in (('cornflower blue', 'b'), ('ivory', 'w')):
+            for rank in range(1, 6):
+                piece_path = output_path / f'hanoi_piece_{suffix}{rank}.svg'
+                if cache.needs_build(piece_path, colour, rank, PIECE_CANVAS):
+                    jobs.append((save_svg, (piece_path,
+                                            *PIECE_CANVAS,
+                                            draw_centred_piece,
+                                            colour,
+                                            rank)))
+        for piece_optimizer in run_jobs(jobs, processes):
+            optimizer.update(piece_optimizer)
+
+        icon_svg_path = output_path / 'hanoi_icon.svg'
+        icon_png_path = output_path / 'hanoi_icon.png'
+        size = round(32*0.6)
+        if cache.needs_build([icon_svg_path, icon_png_path], size):
+            turtle = SvgTurtle.create("32px", "32px")
+            board = HanoiBoard(turtle, 2, size)
+            board.draw()
+            scale = round(board.radius / 4)
+            piece = HanoiPiece(turtle, 'cornflower blue', size=2, scale=scale)
+            piece.draw()
+            turtle.forward(board.radius * sqrt(3))
+            piece = HanoiPiece(turtle, 'ivory', size=3, scale=scale)
+            piece.draw()
+            turtle.save_as(icon_svg_path, optimizer=optimizer)
+            turtle.to_png(write_to=str(icon_png_path))
 
 
 if __name__ == '__main__':
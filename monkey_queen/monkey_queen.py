@@ -2,7 +2,7 @@
 from pathlib import Path
 from turtle import Turtle
 
-from cairosvg import svg2png
+from quarto.build_cache import svg_build
 from quarto.svg_turtle import SvgTurtle
 
 
@@ -93,23 +93,26 @@ def demo():
 
 def main():
     output_path = Path(__file__).parent
-    board_path = output_path / 'monkey_queen_board.svg'
-    size = 170
-    turtle = SvgTurtle.create("172px", "172px")
-    # noinspection PyTypeChecker
-    board = MonkeyQueenBoard(turtle, 12, size)
-    board.draw()
-    turtle.save_as(board_path)
+    with svg_build(output_path, main) as (cache, optimizer):
+        board_path = output_path / 'monkey_queen_board.svg'
+        size = 170
+        if cache.needs_build(board_path, 12, size):
+            turtle = SvgTurtle.create("172px", "172px")
+            # noinspection PyTypeChecker
+            board = MonkeyQueenBoard(turtle, 12, size)
+            board.draw()
+            turtle.save_as(board_path, optimizer=optimizer)
 
-    icon_svg_path = output_path / 'monkey_queen_icon.svg'
-    icon_png_path = output_path / 'monkey_queen_icon.png'
-    size = 30
-    turtle = SvgTurtle.create("32px", "32px")
-    # noinspection PyTypeChecker
-    board = MonkeyQueenBoard(turtle, 2, size)
-    board.draw()
-    turtle.save_as(icon_svg_path)
-    svg2png(icon_svg_path.read_text(), write_to=str(icon_png_path))
+        icon_svg_path = output_path / 'monkey_queen_icon.svg'
+        icon_png_path = output_path / 'monkey_queen_icon.png'
+        size = 30
+        if cache.needs_build([icon_svg_path, icon_png_path], size):
+            turtle = SvgTurtle.create("32px", "32px")
+            # noinspection PyTypeChecker
+            board = MonkeyQueenBoard(turtle, 2, size)
+            board.draw()
+            turtle.save_as(icon_svg_path, optimizer=optimizer)
+            turtle.to_png(write_to=str(icon_png_path))
 
 
 if __name__ == '__main__':
@@ -60,4 +60,5 @@ def main():
             zf.write('palago-red.png', 'userassets/palago-red.png')
 
 
-main()
+if __name__ == '__main__':
+    main()
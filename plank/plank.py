@@ -6,10 +6,15 @@ import typing
 from pathlib import Path
 from turtle import Turtle
 
-from cairosvg import svg2png
-from matplotlib import pyplot as plt
+from quarto.build_cache import svg_build
+from quarto.palette import get_palette
+from quarto.parallel import run_jobs
+from quarto.svg_turtle import SvgTurtle, save_svg
 
-from quarto.svg_turtle import SvgTurtle
+# (width, height) of each file, in pixels
+PLANK_CANVAS = (100, 300)
+PIECE_CANVAS = (100, 100)
+SPACE_SIZE = PLANK_CANVAS[1] * 0.95 / 3  # size of a space on each plank
 
 
 class PlankSet:
@@ -21,9 +26,9 @@ class PlankSet:
         """
         self.turtle = turtle
         self.size = size
-        cm = plt.get_cmap('Paired', 12)
-        self.plank_colours = tuple(cm(i/12)[:3] for i in range(0, 6, 2))
-        self.piece_colours = tuple(cm(i/12)[:3] for i in range(1, 7, 2))
+        colours = get_palette('Paired').colours
+        self.plank_colours = colours[0:6:2]
+        self.piece_colours = colours[1:7:2]
 
     def draw_plank(self, colour_num: int):
         t = self.turtle
@@ -118,35 +123,63 @@ def demo():
     t.stamp()
 
 
-def main():
+def draw_centred_plank(turtle: Turtle, colour_num: int):
+    """ Draw a plank down the middle of a PLANK_CANVAS canvas. """
+    board = PlankSet(turtle, SPACE_SIZE)
+    turtle.right(90)
+    board.draw_plank(colour_num)
+
+
+def draw_centred_piece(turtle: Turtle,
+                       colour_num: int,
+                       side_count: typing.Optional[int]):
+    """ Draw a piece in the middle of a PIECE_CANVAS canvas. """
+    turtle.up()
+    board = PlankSet(turtle, SPACE_SIZE)
+    board.draw_piece(colour_num, side_count)
+
+
+def main(processes: int = 1):
+    """ Generate all the images.
+
+    :param processes: the number of worker processes, or None for one per CPU
+    """
     output_path = Path(__file__).parent
-    size = 300
-    space_size = size * 0.95 / 3
-    colour_names = 'bgr'
-    for colour_num, colour_name in enumerate(colour_names):
-        plank_path = output_path / f'plank_{colour_name}.svg'
-        turtle = SvgTurtle.create("100px", "300px")
-        board = PlankSet(turtle, space_size)
-        turtle.right(90)
-        board.draw_plank(colour_num)
-        turtle.save_as(plank_path)
-
-        for side_count in (3, 4, 6, None):
-            piece_name = side_count or 'c'
-            piece_path = output_path / f'piece_{colour_name}_{piece_name}.svg'
-            turtle = SvgTurtle.create("100px", "100px")
-            turtle.up()
-            board = PlankSet(turtle, space_size)
-            board.draw_piece(colour_num, side_count)
-            turtle.save_as(piece_path)
-
-    icon_svg_path = output_path / 'plank_icon.svg'
-    icon_png_path = output_path / 'plank_icon.png'
-    turtle = SvgTurtle.create("32px", "32px")
-    board = PlankSet(turtle, 10)
-    board.draw_icon()
-    turtle.save_as(icon_svg_path)
-    svg2png(icon_svg_path.read_text(), write_to=str(icon_png_path))
+    with svg_build(output_path, main, get_palette) as (cache, optimizer):
+        colour_names = 'bgr'
+        jobs = []
+        for colour_num, colour_name in enumerate(colour_names):
+            plank_path = output_path / f'plank_{colour_name}.svg'
+            if cache.needs_build(plank_path, SPACE_SIZE, colour_num):
+                jobs.append((save_svg, (plank_path,
+                                        *PLANK_CANVAS,
+                                        draw_centred_plank,
+                                        colour_num)))
+
+            for side_count in (3, 4, 6, None):
+                piece_name = side_count or 'c'
+                piece_path = (output_path /
+                              f'piece_{colour_name}_{piece_name}.svg')
+                if cache.needs_build(piece_path,
+                                     SPACE_SIZE,
+                                     colour_num,
+                                     side_count):
+                    jobs.append((save_svg, (piece_path,
+                                            *PIECE_CANVAS,
+                                            draw_centred_piece,
+                                            colour_num,
+                                            side_count)))
+        for job_optimizer in run_jobs(jobs, processes):
+            optimizer.update(job_optimizer)
+
+        icon_svg_path = output_path / 'plank_icon.svg'
+        icon_png_path = output_path / 'plank_icon.png'
+        if cache.needs_build([icon_svg_path, icon_png_path]):
+            turtle = SvgTurtle.create("32px", "32px")
+            board = PlankSet(turtle, 10)
+            board.draw_icon()
+            turtle.save_as(icon_svg_path, optimizer=optimizer)
+            turtle.to_png(write_to=str(icon_png_path))
 
 
 if __name__ == '__main__':
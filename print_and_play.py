@@ -0,0 +1,378 @@
+""" Lay out game pieces and boards on printable PDF sheets.
+
+Each distinct drawing is written once as a PDF form object, then placed on
+the pages as many times as needed, so big sheet sets stay small.
+
+    python print_and_play.py
+"""
+import math
+import zlib
+from pathlib import Path
+
+from quarto.svg_turtle import (RecordingTurtle,
+                               find_paint,
+                               hex_to_rgb,
+                               trace_segments)
+
+LETTER = (612, 792)  # points
+A4 = (595, 842)
+POINTS_PER_PIXEL = 0.75  # SVG pixels are 1/96 inch, and points are 1/72.
+
+FONT_NAMES = {'normal': 'Helvetica',
+              'bold': 'Helvetica-Bold',
+              'italic': 'Helvetica-Oblique',
+              'bold italic': 'Helvetica-BoldOblique'}
+
+
+class PrintSheets:
+    """ Place turtle drawings on pages, and write them as a PDF. """
+    def __init__(self, page_size=LETTER, margin=36, gap=9):
+        """ Initialize the sheets.
+
+        :param page_size: (width, height) in points
+        :param margin: space around the edge of each page, in points
+        :param gap: space between drawings, in points
+        """
+        self.page_size = page_size
+        self.margin = margin
+        self.gap = gap
+        self.forms = {}  # {content: form_name}
+        self.form_sizes = {}  # {form_name: (width, height)}
+        self.fonts = {}  # {font_name: resource_name}
+        self.pages = []  # [[(form_name, x, y, scale)]]
+        self._x = self._y = self._row_height = None
+
+    def add(self, display_list, count=1, width=None):
+        """ Place copies of a drawing on the sheets.
+
+        Drawings flow left to right, then top to bottom, starting a new
+        page when one is full.
+        :param display_list: recorded by a turtle, see RecordingTurtle
+        :param count: the number of copies to place
+        :param width: the printed width in points, or None to print at the
+            drawing's size on screen.
+        """
+        form_name = self._find_form(display_list)
+        if width is None:
+            width = display_list.width * POINTS_PER_PIXEL
+        scale = width / display_list.width
+        height = display_list.height * scale
+        page_width, page_height = self.page_size
+        for _ in range(count):
+            if self._x is not None and (
+                    self._x + width > page_width - self.margin):
+                self._x = self.margin
+                self._y -= self._row_height + self.gap
+                self._row_height = 0
+            if self._x is None or self._y - height < self.margin:
+                self.pages.append([])
+                self._x = self.margin
+                self._y = page_height - self.margin
+                self._row_height = 0
+            self.pages[-1].append(
+                (form_name, self._x, self._y - height, scale))
+            self._x += width + self.gap
+            self._row_height = max(self._row_height, height)
+
+    def _find_form(self, display_list):
+        content = self._draw_primitives(display_list)
+        form_name = self.forms.get(content)
+        if form_name is None:
+            form_name = 'Fm{}'.format(len(self.forms))
+            self.forms[content] = form_name
+            self.form_sizes[form_name] = (display_list.width,
+                                          display_list.height)
+        return form_name
+
+    def _draw_primitives(self, display_list):
+        """ Convert a display list to PDF drawing operators.
+
+        PDF's y axis points up, so the canvas is flipped first.
+        """
+        commands = ['1 0 0 -1 0 {} cm'.format(_num(display_list.height))]
+        for primitive in display_list.primitives:
+            kind, geometry, style = primitive
+            if kind == 'text':
+                commands.extend(self._draw_text(*geometry, **style))
+                continue
+            commands.append('q')
+            if kind in ('line', 'shape'):
+                path = _PdfPath()
+                trace_segments(path, geometry)
+                commands.extend(path.commands)
+            elif kind == 'dot':
+                x, y, diameter = geometry
+                path = _PdfPath()
+                path.arc(x, y, diameter/2, 0, 2*math.pi)
+                path.close_path()
+                commands.extend(path.commands)
+            else:
+                x, y, heading, scale = geometry
+                angle = math.radians(-heading)
+                cos_scale = math.cos(angle) * scale
+                sin_scale = math.sin(angle) * scale
+                commands.append('{} {} {} {} {} {} cm'.format(
+                    *map(_num, (cos_scale, sin_scale, -sin_scale, cos_scale,
+                                x, y))))
+                points = RecordingTurtle._STAMP_POINTS
+                commands.append('{} {} m'.format(*map(_num, points[0])))
+                commands.extend('{} {} l'.format(*map(_num, point))
+                                for point in points[1:])
+                commands.append('h')
+            commands.extend(_paint(kind, **style))
+            commands.append('Q')
+        return '\n'.join(commands)
+
+    def _draw_text(self, text, x, y, align, font, fill='#000000'):
+        font_name, font_size, font_style = font
+        base_font = FONT_NAMES.get(font_style, 'Helvetica')
+        resource_name = self.fonts.setdefault(base_font,
+                                              'F{}'.format(len(self.fonts)))
+        font_size *= 1.65
+        # Standard fonts aren't measured, so guess at the width.
+        width = len(text) * font_size * 0.55
+        x -= dict(left=0, center=width/2, right=width)[align]
+        escaped = (text.replace('\\', '\\\\')
+                   .replace('(', '\\(')
+                   .replace(')', '\\)'))
+        return ['{} {} {} rg'.format(*map(_num, hex_to_rgb(fill))),
+                'BT /{} {} Tf 1 0 0 -1 {} {} Tm ({}) Tj ET'.format(
+                    resource_name,
+                    _num(font_size),
+                    _num(x),
+                    _num(y),
+                    escaped)]
+
+    def to_pdf(self) -> bytes:
+        writer = _PdfWriter()
+        catalog = writer.reserve()
+        pages_object = writer.reserve()
+        font_objects = {
+            resource_name: writer.add(
+                '<< /Type /Font /Subtype /Type1 /BaseFont /{} '
+                '/Encoding /WinAnsiEncoding >>'.format(base_font))
+            for base_font, resource_name in self.fonts.items()}
+        fonts = ' '.join('/{} {} 0 R'.format(name, number)
+                         for name, number in font_objects.items())
+        form_objects = {}
+        for content, form_name in self.forms.items():
+            width, height = self.form_sizes[form_name]
+            form_objects[form_name] = writer.add_stream(
+                '/Type /XObject /Subtype /Form /BBox [0 0 {} {}] '
+                '/Resources << /Font << {} >> >>'.format(_num(width),
+                                                        _num(height),
+                                                        fonts),
+                content)
+        page_width, page_height = self.page_size
+        page_objects = []
+        for placements in self.pages:
+            used_forms = sorted({form_name for form_name, *_ in placements})
+            x_objects = ' '.join('/{} {} 0 R'.format(name,
+                                                     form_objects[name])
+                                 for name in used_forms)
+            content = '\n'.join(
+                'q {0} 0 0 {0} {1} {2} cm /{3} Do Q'.format(_num(scale),
+                                                           _num(x),
+                                                           _num(y),
+                                                           form_name)
+                for form_name, x, y, scale in placements)
+            content_object = writer.add_stream('', content)
+            page_objects.append(writer.add(
+                '<< /Type /Page /Parent {} 0 R /MediaBox [0 0 {} {}] '
+                '/Resources << /XObject << {} >> >> '
+                '/Contents {} 0 R >>'.format(pages_object,
+                                             page_width,
+                                             page_height,
+                                             x_objects,
+                                             content_object)))
+        writer.set(pages_object,
+                   '<< /Type /Pages /Kids [{}] /Count {} >>'.format(
+                       ' '.join('{} 0 R'.format(number)
+                                for number in page_objects),
+                       len(page_objects)))
+        writer.set(catalog,
+                   '<< /Type /Catalog /Pages {} 0 R >>'.format(pages_object))
+        return writer.to_bytes(catalog)
+
+    def save_as(self, filename):
+        Path(filename).write_bytes(self.to_pdf())
+
+
+class _PdfWriter:
+    """ Collect numbered PDF objects, and write them with a cross-reference
+    table. """
+    def __init__(self):
+        self.objects = []  # [bytes or None]
+
+    def reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, number, text):
+        self.objects[number-1] = text.encode('latin-1')
+
+    def add(self, text):
+        number = self.reserve()
+        self.set(number, text)
+        return number
+
+    def add_stream(self, dictionary, content):
+        data = zlib.compress(content.encode('latin-1'))
+        number = self.reserve()
+        self.objects[number-1] = (
+            '<< {} /Filter /FlateDecode /Length {} >>\nstream\n'.format(
+                dictionary,
+                len(data)).encode('latin-1') + data + b'\nendstream')
+        return number
+
+    def to_bytes(self, root):
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, data in enumerate(self.objects, 1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n' % number
+            output += data
+            output += b'\nendobj\n'
+        xref_offset = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (
+            len(self.objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += (b'trailer\n<< /Size %d /Root %d 0 R >>\n'
+                   b'startxref\n%d\n%%%%EOF\n' % (len(self.objects) + 1,
+                                                  root,
+                                                  xref_offset))
+        return bytes(output)
+
+
+class _PdfPath:
+    """ Collect PDF path operators, with the path methods of a cairo
+    context, so it can be passed to trace_segments(). """
+    def __init__(self):
+        self.commands = []
+        self._point = None  # (x, y) as formatted for PDF
+
+    def move_to(self, x, y):
+        self._point = (_num(x), _num(y))
+        self.commands.append('{} {} m'.format(*self._point))
+
+    def line_to(self, x, y):
+        self._point = (_num(x), _num(y))
+        self.commands.append('{} {} l'.format(*self._point))
+
+    def close_path(self):
+        self.commands.append('h')
+
+    def arc(self, x, y, radius, angle1, angle2):
+        """ Add an arc with increasing angles, like cairo does. """
+        while angle2 < angle1:
+            angle2 += 2*math.pi
+        self._add_arc(x, y, radius, angle1, angle2 - angle1)
+
+    def arc_negative(self, x, y, radius, angle1, angle2):
+        """ Add an arc with decreasing angles, like cairo does. """
+        while angle2 > angle1:
+            angle2 -= 2*math.pi
+        self._add_arc(x, y, radius, angle1, angle2 - angle1)
+
+    def _add_arc(self, x, y, radius, start_angle, extent):
+        """ Add Bezier curves for an arc, at most a quarter turn each. """
+        start = (x + radius*math.cos(start_angle),
+                 y + radius*math.sin(start_angle))
+        if self._point is None:
+            self.move_to(*start)
+        elif self._point != (_num(start[0]), _num(start[1])):
+            self.line_to(*start)
+        piece_count = max(1, math.ceil(abs(extent) / (math.pi/2) - 1e-9))
+        step = extent / piece_count
+        handle = 4/3 * math.tan(step/4) * radius
+        angle = start_angle
+        for _ in range(piece_count):
+            next_angle = angle + step
+            cos1, sin1 = math.cos(angle), math.sin(angle)
+            cos2, sin2 = math.cos(next_angle), math.sin(next_angle)
+            end = (x + radius*cos2, y + radius*sin2)
+            self.commands.append('{} {} {} {} {} {} c'.format(*map(_num, (
+                x + radius*cos1 - handle*sin1,
+                y + radius*sin1 + handle*cos1,
+                end[0] + handle*sin2,
+                end[1] - handle*cos2,
+                *end))))
+            angle = next_angle
+        self._point = (_num(end[0]), _num(end[1]))
+
+
+def _num(value):
+    """ Format a number for PDF, without trailing zeros. """
+    text = '{:.3f}'.format(value).rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def _paint(kind, **style):
+    """ Generate operators to fill and stroke the path, see find_paint(). """
+    paint = find_paint(kind, **style)
+    if paint.fill is not None:
+        yield '{} {} {} rg'.format(*map(_num, paint.fill))
+    if paint.stroke is not None:
+        yield '{} {} {} RG'.format(*map(_num, paint.stroke))
+        yield '{} w {} J {} j'.format(
+            _num(paint.stroke_width),
+            dict(butt=0, round=1, square=2)[paint.linecap],
+            dict(miter=0, round=1, bevel=2)[paint.linejoin])
+    even_odd = '*' if paint.even_odd else ''
+    if paint.fill is not None and paint.stroke is not None:
+        yield 'B' + even_odd
+    elif paint.fill is not None:
+        yield 'f' + even_odd
+    elif paint.stroke is not None:
+        yield 'S'
+    else:
+        yield 'n'
+
+
+def record(width, height, draw, *args):
+    """ Record a drawing function with a new turtle.
+
+    :param draw: called with the turtle and args
+    """
+    turtle = RecordingTurtle.create(width, height)
+    draw(turtle, *args)
+    return turtle.finish()
+
+
+def main():
+    from hanoi import hanoi
+    from plank import plank
+    from quarto import quarto
+
+    sheets = PrintSheets()
+    for name, flags in quarto.generate_flags():
+        piece = record(*quarto.PIECE_CANVAS, quarto.draw_centred_piece, flags)
+        sheets.add(piece, width=90)
+    for colour_num in range(3):
+        piece = record(*plank.PLANK_CANVAS,
+                       plank.draw_centred_plank,
+                       colour_num)
+        sheets.add(piece, width=72)
+    for colour_num in range(3):
+        for side_count in (3, 4, 6, None):
+            piece = record(*plank.PIECE_CANVAS,
+                           plank.draw_centred_piece,
+                           colour_num,
+                           side_count)
+            sheets.add(piece, count=2, width=54)
+    for colour in ('cornflower blue', 'ivory'):
+        for rank in range(1, 6):
+            piece = record(*hanoi.PIECE_CANVAS,
+                           hanoi.draw_centred_piece,
+                           colour,
+                           rank)
+            sheets.add(piece, width=108)
+    pdf_path = Path(__file__).parent / 'print_and_play.pdf'
+    sheets.save_as(pdf_path)
+    print(f'Wrote {len(sheets.pages)} pages with {len(sheets.forms)} '
+          f'drawings to {pdf_path.name}.')
+
+
+if __name__ == '__main__':
+    main()
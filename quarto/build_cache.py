@@ -0,0 +1,148 @@
+""" Skip rebuilding generated files when none of their inputs have changed.
+
+A manifest file records a hash of each output's inputs: the generator's
+source files, the versions of the libraries it uses, the parameters it drew
+with, and any input files, like JSON templates or images to archive.
+"""
+from contextlib import contextmanager
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+import inspect
+import json
+import os
+from pathlib import Path
+
+# Set to a non-empty value to rebuild everything, like build_all --force.
+FORCE_VARIABLE = 'BUILD_CACHE_FORCE'
+
+
+class BuildCache:
+    def __init__(self, manifest_path, sources=(), packages=(), force=None):
+        """ Initialize the object.
+
+        :param manifest_path: JSON file that records the builds, with output
+            paths relative to its folder
+        :param sources: source files that every output depends on, or
+            modules, classes, or functions to find the source files from
+        :param packages: names of the library distributions that every
+            output depends on, like 'svgwrite' or 'Pillow'
+        :param force: True if every output should be built, even if it's
+            current, or None to check the FORCE_VARIABLE environment
+            variable.
+        """
+        if force is None:
+            force = bool(os.environ.get(FORCE_VARIABLE))
+        self.force = force
+        self.manifest_path = Path(manifest_path)
+        try:
+            self.manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.pending = {}
+        self.built_count = self.skipped_count = 0
+        base_hash = sha256()
+        for source in sources:
+            if not isinstance(source, (str, Path)):
+                source = inspect.getsourcefile(inspect.unwrap(source))
+            base_hash.update(Path(source).read_bytes())
+        for package in packages:
+            try:
+                package_version = version(package)
+            except PackageNotFoundError:
+                package_version = None
+            base_hash.update(f'{package}=={package_version}\n'.encode())
+        self.base_hash = base_hash
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.save()
+
+    def needs_build(self, targets, *params, inputs=()) -> bool:
+        """ Check whether output files are missing or out of date.
+
+        If this returns True, build the targets before calling save().
+        :param targets: an output path, or a list of paths that get built
+            together
+        :param params: parameters that the targets are drawn with, compared
+            by their repr()
+        :param inputs: paths of files that the targets are built from
+        """
+        key = self.find_key(*params, inputs=inputs)
+        if not self.force and self.is_current(targets, key):
+            self.skipped_count += 1
+            return False
+        self.record(targets, key)
+        self.built_count += 1
+        return True
+
+    def find_key(self, *params, inputs=()) -> str:
+        """ Hash the inputs, along with the sources and packages. """
+        input_hash = self.base_hash.copy()
+        input_hash.update(repr(params).encode())
+        for input_path in inputs:
+            input_hash.update(Path(input_path).read_bytes())
+        return input_hash.hexdigest()
+
+    def is_current(self, targets, key: str) -> bool:
+        """ Check that output files exist and were built with a key. """
+        if isinstance(targets, (str, Path)):
+            targets = [targets]
+        return all(self.manifest.get(self._find_name(target)) == key and
+                   Path(target).exists()
+                   for target in targets)
+
+    def record(self, targets, key: str):
+        """ Record output files as built with a key, at the next save(). """
+        if isinstance(targets, (str, Path)):
+            targets = [targets]
+        for target in targets:
+            self.pending[self._find_name(target)] = key
+
+    def _find_name(self, target):
+        target = Path(target).resolve()
+        folder = self.manifest_path.resolve().parent
+        try:
+            return target.relative_to(folder).as_posix()
+        except ValueError:
+            return target.as_posix()
+
+    def save(self):
+        """ Record the builds since the last save, in the manifest file. """
+        if not self.pending:
+            return
+        self.manifest.update(self.pending)
+        self.pending.clear()
+        self.manifest_path.write_text(
+            json.dumps(self.manifest, indent=2, sort_keys=True) + '\n')
+
+    def report(self):
+        return 'Built {}, skipped {} unchanged.'.format(self.built_count,
+                                                        self.skipped_count)
+
+
+@contextmanager
+def svg_build(folder, *sources):
+    """ Build a game's SVG files with a shared cache and optimizer.
+
+    Yields (cache, optimizer). When the block finishes, the cache is saved
+    and both reports are printed.
+    :param folder: the game's folder, where the cache's manifest is kept
+    :param sources: what the files depend on besides SvgTurtle, like the
+        game's main() function, see BuildCache
+    """
+    try:
+        from .svg_turtle import SvgOptimizer, SvgTurtle
+    except ImportError:
+        # Running as a script, with this folder on the path.
+        from svg_turtle import SvgOptimizer, SvgTurtle
+
+    optimizer = SvgOptimizer()
+    with BuildCache(Path(folder) / '.build_cache.json',
+                    sources=(*sources, SvgTurtle),
+                    packages=('svgwrite', 'cairosvg')) as cache:
+        yield cache, optimizer
+    print(optimizer.report())
+    print(cache.report())
@@ -0,0 +1,191 @@
+""" Colour maps for the board generators, without importing matplotlib.
+
+The tables hold the same colours as the matplotlib colour maps of the same
+names, rounded to eight bits per channel, because that's all that SvgTurtle
+writes anyway. Palettes are looked up the same way as matplotlib's, so
+get_palette('magma')(0.5) matches plt.get_cmap('magma')(0.5)[:3].
+"""
+from functools import lru_cache
+
+# {name: hex colours}, generated from matplotlib 3.
+_TABLES = dict(
+    inferno=(
+        '00000401000501010601010802010a02020c02020e030210040312040314050417'
+        '06041907051b08051d09061f0a07220b07240c08260d08290e092b10092d110a30'
+        '120a32140b34150b37160b39180c3c190c3e1b0c411c0c431e0c451f0c48210c4a'
+        '230c4c240c4f260c51280b53290b552b0b572d0b592f0a5b310a5c320a5e340a5f'
+        '3609613809623909633b09643d09653e0966400a67420a68440a68450a69470b6a'
+        '490b6a4a0c6b4c0c6b4d0d6c4f0d6c510e6c520e6d540f6d550f6d57106e59106e'
+        '5a116e5c126e5d126e5f136e61136e62146e64156e65156e67166e69166e6a176e'
+        '6c186e6d186e6f196e71196e721a6e741a6e751b6e771c6d781c6d7a1d6d7c1d6d'
+        '7d1e6d7f1e6c801f6c82206c84206b85216b87216b88226a8a226a8c23698d2369'
+        '8f24699025689225689326679526679727669827669a28659b29649d29649f2a63'
+        'a02a63a22b62a32c61a52c60a62d60a82e5fa92e5eab2f5ead305dae305cb0315b'
+        'b1325ab3325ab43359b63458b73557b93556ba3655bc3754bd3853bf3952c03a51'
+        'c13a50c33b4fc43c4ec63d4dc73e4cc83f4bca404acb4149cc4248ce4347cf4446'
+        'd04545d24644d34743d44842d54a41d74b3fd84c3ed94d3dda4e3cdb503bdd513a'
+        'de5238df5337e05536e15635e25734e35933e45a31e55c30e65d2fe75e2ee8602d'
+        'e9612bea632aeb6429eb6628ec6726ed6925ee6a24ef6c23ef6e21f06f20f1711f'
+        'f1731df2741cf3761bf37819f47918f57b17f57d15f67e14f68013f78212f78410'
+        'f8850ff8870ef8890cf98b0bf98c0af98e09fa9008fa9207fa9407fb9606fb9706'
+        'fb9906fb9b06fb9d07fc9f07fca108fca309fca50afca60cfca80dfcaa0ffcac11'
+        'fcae12fcb014fcb216fcb418fbb61afbb81dfbba1ffbbc21fbbe23fac026fac228'
+        'fac42afac62df9c72ff9c932f9cb35f8cd37f8cf3af7d13df7d340f6d543f6d746'
+        'f5d949f5db4cf4dd4ff4df53f4e156f3e35af3e55df2e661f2e865f2ea69f1ec6d'
+        'f1ed71f1ef75f1f179f2f27df2f482f3f586f3f68af4f88ef5f992f6fa96f8fb9a'
+        'f9fc9dfafda1fcffa4'),
+    magma=(
+        '00000401000501010601010802010902020b02020d03030f030312040414050416'
+        '06051806051a07061c08071e0907200a08220b09240c09260d0a290e0b2b100b2d'
+        '110c2f120d31130d34140e36150e38160f3b180f3d19103f1a10421c10441d1147'
+        '1e114920114b21114e22115024125325125527125829115a2a115c2c115f2d1161'
+        '2f116331116533106734106936106b38106c390f6e3b0f703d0f713f0f72400f74'
+        '420f75440f764510774710784910784a10794c117a4e117b4f127b51127c52137c'
+        '54137d56147d57157e59157e5a167e5c167f5d177f5f187f601880621980641a80'
+        '651a80671b80681c816a1c816b1d816d1d816e1e81701f81721f81732081752181'
+        '7621817822817922827b23827c23827e2482802582812581832681842681862781'
+        '8827818928818b29818c29818e2a81902a81912b81932b80942c80962c80982d80'
+        '992d809b2e7f9c2e7f9e2f7fa02f7fa1307ea3307ea5317ea6317da8327daa337d'
+        'ab337cad347cae347bb0357bb2357bb3367ab5367ab73779b83779ba3878bc3978'
+        'bd3977bf3a77c03a76c23b75c43c75c53c74c73d73c83e73ca3e72cc3f71cd4071'
+        'cf4070d0416fd2426fd3436ed5446dd6456cd8456cd9466bdb476adc4869de4968'
+        'df4a68e04c67e24d66e34e65e44f64e55064e75263e85362e95462ea5661eb5760'
+        'ec5860ed5a5fee5b5eef5d5ef05f5ef1605df2625df2645cf3655cf4675cf4695c'
+        'f56b5cf66c5cf66e5cf7705cf7725cf8745cf8765cf9785df9795df97b5dfa7d5e'
+        'fa7f5efa815ffb835ffb8560fb8761fc8961fc8a62fc8c63fc8e64fc9065fd9266'
+        'fd9467fd9668fd9869fd9a6afd9b6bfe9d6cfe9f6dfea16efea36ffea571fea772'
+        'fea973feaa74feac76feae77feb078feb27afeb47bfeb67cfeb77efeb97ffebb81'
+        'febd82febf84fec185fec287fec488fec68afec88cfeca8dfecc8ffecd90fecf92'
+        'fed194fed395fed597fed799fed89afdda9cfddc9efddea0fde0a1fde2a3fde3a5'
+        'fde5a7fde7a9fde9aafdebacfcecaefceeb0fcf0b2fcf2b4fcf4b6fcf6b8fcf7b9'
+        'fcf9bbfcfbbdfcfdbf'),
+    Paired=(
+        'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6fff7f00cab2d66a3d9affff99'
+        'b15928'),
+    Pastel1=(
+        'fbb4aeb3cde3ccebc5decbe4fed9a6ffffcce5d8bdfddaecf2f2f2'),
+    plasma=(
+        '0d088710078813078916078a19068c1b068d1d068e20068f220690240691260591'
+        '2805922a05932c05942e05952f059631059733059735049837049938049a3a049a'
+        '3c049b3e049c3f049c41049d43039e44039e46039f48039f4903a04b03a14c02a1'
+        '4e02a25002a25102a35302a35502a45601a45801a45901a55b01a55c01a65e01a6'
+        '6001a66100a76300a76400a76600a76700a86900a86a00a86c00a86e00a86f00a8'
+        '7100a87201a87401a87501a87701a87801a87a02a87b02a87d03a87e03a88004a8'
+        '8104a78305a78405a78606a68707a68808a68a09a58b0aa58d0ba58e0ca48f0da4'
+        '910ea3920fa39410a29511a19613a19814a099159f9a169f9c179e9d189d9e199d'
+        'a01a9ca11b9ba21d9aa31e9aa51f99a62098a72197a82296aa2395ab2494ac2694'
+        'ad2793ae2892b02991b12a90b22b8fb32c8eb42e8db52f8cb6308bb7318ab83289'
+        'ba3388bb3488bc3587bd3786be3885bf3984c03a83c13b82c23c81c33d80c43e7f'
+        'c5407ec6417dc7427cc8437bc9447aca457acb4679cc4778cc4977cd4a76ce4b75'
+        'cf4c74d04d73d14e72d24f71d35171d45270d5536fd5546ed6556dd7566cd8576b'
+        'd9586ada5a6ada5b69db5c68dc5d67dd5e66de5f65de6164df6263e06363e16462'
+        'e26561e26660e3685fe4695ee56a5de56b5de66c5ce76e5be76f5ae87059e97158'
+        'e97257ea7457eb7556eb7655ec7754ed7953ed7a52ee7b51ef7c51ef7e50f07f4f'
+        'f0804ef1814df1834cf2844bf3854bf3874af48849f48948f58b47f58c46f68d45'
+        'f68f44f79044f79143f79342f89441f89540f9973ff9983ef99a3efa9b3dfa9c3c'
+        'fa9e3bfb9f3afba139fba238fca338fca537fca636fca835fca934fdab33fdac33'
+        'fdae32fdaf31fdb130fdb22ffdb42ffdb52efeb72dfeb82cfeba2cfebb2bfebd2a'
+        'febe2afec029fdc229fdc328fdc527fdc627fdc827fdca26fdcb26fccd25fcce25'
+        'fcd025fcd225fbd324fbd524fbd724fad824fada24f9dc24f9dd25f8df25f8e125'
+        'f7e225f7e425f6e626f6e826f5e926f5eb27f4ed27f3ee27f3f027f2f227f1f426'
+        'f1f525f0f724f0f921'),
+    viridis=(
+        '44015444025645045745055946075a46085c460a5d460b5e470d60470e61471063'
+        '47116447136548146748166848176948186a481a6c481b6d481c6e481d6f481f70'
+        '482071482173482374482475482576482677482878482979472a7a472c7a472d7b'
+        '472e7c472f7d46307e46327e46337f463480453581453781453882443983443a83'
+        '443b84433d84433e85423f854240864241864142874144874045884046883f4788'
+        '3f48893e49893e4a893e4c8a3d4d8a3d4e8a3c4f8a3c508b3b518b3b528b3a538b'
+        '3a548c39558c39568c38588c38598c375a8c375b8d365c8d365d8d355e8d355f8d'
+        '34608d34618d33628d33638d32648e32658e31668e31678e31688e30698e306a8e'
+        '2f6b8e2f6c8e2e6d8e2e6e8e2e6f8e2d708e2d718e2c718e2c728e2c738e2b748e'
+        '2b758e2a768e2a778e2a788e29798e297a8e297b8e287c8e287d8e277e8e277f8e'
+        '27808e26818e26828e26828e25838e25848e25858e24868e24878e23888e23898e'
+        '238a8d228b8d228c8d228d8d218e8d218f8d21908d21918c20928c20928c20938c'
+        '1f948c1f958b1f968b1f978b1f988b1f998a1f9a8a1e9b8a1e9c891e9d891f9e89'
+        '1f9f881fa0881fa1881fa1871fa28720a38620a48621a58521a68522a78522a884'
+        '23a98324aa8325ab8225ac8226ad8127ad8128ae8029af7f2ab07f2cb17e2db27d'
+        '2eb37c2fb47c31b57b32b67a34b67935b77937b87838b9773aba763bbb753dbc74'
+        '3fbc7340bd7242be7144bf7046c06f48c16e4ac16d4cc26c4ec36b50c46a52c569'
+        '54c56856c66758c7655ac8645cc8635ec96260ca6063cb5f65cb5e67cc5c69cd5b'
+        '6ccd5a6ece5870cf5773d05675d05477d1537ad1517cd2507fd34e81d34d84d44b'
+        '86d54989d5488bd6468ed64590d74393d74195d84098d83e9bd93c9dd93ba0da39'
+        'a2da37a5db36a8db34aadc32addc30b0dd2fb2dd2db5de2bb8de29bade28bddf26'
+        'c0df25c2df23c5e021c8e020cae11fcde11dd0e11cd2e21bd5e21ad8e219dae319'
+        'dde318dfe318e2e418e5e419e7e419eae51aece51befe51cf1e51df4e61ef6e620'
+        'f8e621fbe723fde725'),
+)
+
+
+class Palette:
+    def __init__(self, name: str, colours: tuple):
+        """ Initialize the object.
+
+        :param name: the colour map's name
+        :param colours: a sequence of (r, g, b) tuples from 0.0 to 1.0
+        """
+        self.name = name
+        self.colours = tuple(colours)
+        self.N = len(self.colours)
+        self._table = None  # numpy array of colours, built when needed
+
+    def __repr__(self):
+        return f'Palette({self.name!r}, N={self.N})'
+
+    def __call__(self, x):
+        """ Sample colours along the palette.
+
+        :param x: a number from 0.0 to 1.0, an iterable of them, or a numpy
+            array of them, which is looked up in one step. Values outside the
+            range get the end colours.
+        :return: an (r, g, b) tuple, a list of them if x was iterable, or an
+            array with an extra axis for r, g, and b if x was a numpy array
+        """
+        if getattr(x, 'ndim', 0):
+            return self._sample_array(x)
+        try:
+            points = iter(x)
+        except TypeError:
+            return self.colours[self._find_index(x)]
+        colours = self.colours
+        find_index = self._find_index
+        return [colours[find_index(point)] for point in points]
+
+    def _sample_array(self, x):
+        import numpy
+
+        if self._table is None:
+            self._table = numpy.array(self.colours)
+        n = self.N
+        indexes = (numpy.asarray(x) * n).astype(int)
+        return self._table[numpy.clip(indexes, 0, n - 1)]
+
+    def _find_index(self, x):
+        n = self.N
+        return min(max(int(x * n), 0), n - 1)
+
+    def resampled(self, n: int) -> 'Palette':
+        """ Build a palette with n colours spread evenly along this one. """
+        return Palette(self.name, self([i / max(n-1, 1) for i in range(n)]))
+
+
+@lru_cache(maxsize=None)
+def get_palette(name: str, n: int = None) -> Palette:
+    """ Get a palette by name, like plt.get_cmap().
+
+    Palettes are cached, so it's cheap to call this for every board.
+    :param name: one of the names in _TABLES, like 'magma' or 'Paired'
+    :param n: number of colours to resample the palette to, or None to keep
+        all of them
+    """
+    try:
+        table = ''.join(_TABLES[name])
+    except KeyError:
+        raise ValueError(f'Unknown palette {name!r}, expected one of: ' +
+                         ', '.join(sorted(_TABLES))) from None
+    colours = (tuple(int(table[j:j+2], 16) / 255 for j in range(i, i+6, 2))
+               for i in range(0, len(table), 6))
+    palette = Palette(name, colours)
+    if n is not None and n != palette.N:
+        palette = palette.resampled(n)
+    return palette
@@ -0,0 +1,23 @@
+""" Run independent drawing jobs on a pool of worker processes. """
+import os
+
+
+def run_jobs(jobs, processes=None) -> list:
+    """ Call each job's function with its arguments, in parallel.
+
+    :param jobs: [(function, args)] where each function is defined at module
+        level, so it can be sent to a worker process
+    :param processes: the number of worker processes, None for one per CPU,
+        or 1 to run every job in this process.
+    :return: the functions' results, in the same order as the jobs
+    """
+    jobs = list(jobs)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes == 1 or len(jobs) < 2:
+        return [function(*args) for function, args in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(min(processes, len(jobs))) as executor:
+        futures = [executor.submit(function, *args) for function, args in jobs]
+        return [future.result() for future in futures]
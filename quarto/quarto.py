@@ -1,8 +1,17 @@
 from pathlib import Path
 from turtle import Turtle
 
-from cairosvg import svg2png
-from svg_turtle import SvgTurtle
+try:
+    from .build_cache import svg_build
+    from .parallel import run_jobs
+    from .svg_turtle import SvgTurtle, save_svg
+except ImportError:
+    # Running as a script, with this folder on the path.
+    from build_cache import svg_build
+    from parallel import run_jobs
+    from svg_turtle import SvgTurtle, save_svg
+
+PIECE_CANVAS = (64, 64)  # (width, height) of each piece's file, in pixels
 
 
 def draw_piece(turtle: Turtle,
@@ -147,40 +156,56 @@ def demo():
         draw_piece(turtle, size*3/16, *flags)
 
 
-def main():
-    output_path = Path(__file__).parent
-    for name, flags in generate_flags():
-        file_name = f'quarto{name}.svg'
-        file_path = output_path / file_name
-        size = 62
-        turtle = SvgTurtle.create("64px", "64px")
-        turtle.up()
-        turtle.back(size/2)
-        turtle.right(90)
-        turtle.back(size/2)
-        turtle.left(90)
-        # noinspection PyTypeChecker
-        draw_piece(turtle, size, *flags)
-        turtle.save_as(file_path)
-
-    board_path = output_path / 'quarto_board.svg'
-    size = 170
-    turtle = SvgTurtle.create("172px", "172px")
-    # noinspection PyTypeChecker
-    draw_board(turtle, size)
-    turtle.save_as(board_path)
+def draw_centred_piece(turtle: Turtle, flags):
+    """ Draw a piece in the middle of a PIECE_CANVAS canvas. """
+    size = PIECE_CANVAS[0] - 2
+    turtle.up()
+    turtle.back(size/2)
+    turtle.right(90)
+    turtle.back(size/2)
+    turtle.left(90)
+    draw_piece(turtle, size, *flags)
+
 
-    icon_svg_path = output_path / 'quarto_icon.svg'
-    icon_png_path = output_path / 'quarto_icon.png'
-    size = 30
-    turtle = SvgTurtle.create("32px", "32px")
-    # noinspection PyTypeChecker
-    draw_icon(turtle, size)
-    turtle.save_as(icon_svg_path)
-    svg2png(icon_svg_path.read_text(), write_to=str(icon_png_path))
+def main(processes: int = 1):
+    """ Generate all the images.
+
+    :param processes: the number of worker processes, or None for one per CPU
+    """
+    output_path = Path(__file__).parent
+    with svg_build(output_path, main) as (cache, optimizer):
+        jobs = []
+        for name, flags in generate_flags():
+            file_name = f'quarto{name}.svg'
+            file_path = output_path / file_name
+            if cache.needs_build(file_path, PIECE_CANVAS, flags):
+                jobs.append((save_svg, (file_path,
+                                        *PIECE_CANVAS,
+                                        draw_centred_piece,
+                                        flags)))
+        for piece_optimizer in run_jobs(jobs, processes):
+            optimizer.update(piece_optimizer)
+
+        board_path = output_path / 'quarto_board.svg'
+        size = 170
+        if cache.needs_build(board_path, size):
+            turtle = SvgTurtle.create("172px", "172px")
+            # noinspection PyTypeChecker
+            draw_board(turtle, size)
+            turtle.save_as(board_path, optimizer=optimizer)
+
+        icon_svg_path = output_path / 'quarto_icon.svg'
+        icon_png_path = output_path / 'quarto_icon.png'
+        size = 30
+        if cache.needs_build([icon_svg_path, icon_png_path], size):
+            turtle = SvgTurtle.create("32px", "32px")
+            # noinspection PyTypeChecker
+            draw_icon(turtle, size)
+            turtle.save_as(icon_svg_path, optimizer=optimizer)
+            turtle.to_png(write_to=str(icon_png_path))
 
 
 if __name__ == '__main__':
     main()
-else:
+elif __name__ == '__live_coding__':
     demo()
@@ -1,20 +1,29 @@
-from collections import namedtuple
+from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from io import BytesIO
+import math
+import os
 import re
-from turtle import TNavigator, TPen
-
-import svgwrite
+from time import perf_counter
+from turtle import TNavigator, TPen, Vec2D
 
 ANCHOR_NAMES = dict(left='start',
                     center='middle',
                     right='end')
 
 
-class SvgTurtle(TNavigator, TPen):
-    """ Helper class to include turtle graphics within a PDF document. """
+class PrimitiveTurtle(TNavigator, TPen):
+    """ Turtle that breaks its drawing into primitives for a subclass.
+
+    The primitives are lines, shapes, dots, text, and stamps, in canvas
+    coordinates with the y axis pointing down. Subclasses draw them on their
+    canvas in _render().
+    """
 
     class _Screen(object):
-        def __init__(self, drawing, width, height):
-            self.cv = drawing
+        def __init__(self, cv, width, height):
+            self.cv = cv
             self._window_width = width
             self._window_height = height
 
@@ -24,80 +33,290 @@ class SvgTurtle(TNavigator, TPen):
         def window_height(self):
             return self._window_height
 
+    # heading is in degrees counterclockwise from east, and color is
+    # (pencolor, fillcolor).
     _Stamp = namedtuple('Stamp', 'pos heading color')
 
-    @classmethod
-    def create(cls, width="400px", height="250px", bgcolor=None) -> "SvgTurtle":
-        svg_drawing = cls.create_svg(width, height)
-        turtle = cls(svg_drawing)
-        if bgcolor is not None:
-            bgcolor_str = turtle._colorstr(bgcolor)
-            svg_drawing.add(svg_drawing.rect(fill=bgcolor_str,
-                                             size=('100%', '100%')))
-        return turtle
+    # The classic turtle arrow, pointing east with its tip at the origin.
+    _STAMP_POINTS = ((0, 0), (-9, -5), (-7, 0), (-9, 5))
 
-    @classmethod
-    def create_svg(cls, width, height):
-        if not isinstance(width, str):
-            width = f'{width}px'
-        if not isinstance(height, str):
-            height = f'{height}px'
-        svg_drawing = svgwrite.Drawing(size=(width, height))
-        return svg_drawing
+    # arc is None for a straight line, or (radius, sweep_flag) for an arc.
+    _Segment = namedtuple('Segment', 'x1 y1 x2 y2 pencolor pensize arc')
 
-    def __init__(self, drawing, width=None, height=None):
-        if width is None:
-            width = _parse_int(drawing['width'])
-        if height is None:
-            height = _parse_int(drawing['height'])
-        clip_path = drawing.defs.add(drawing.clipPath(id='border_clip'))
-        clip_path.add(drawing.rect(size=(width, height)))
-        self._path = None
-        self._lines_to_draw = None
+    # kind is 'line', 'shape', 'dot', 'text', or 'stamp'. See
+    # SvgTurtle._create_element().
+    _Primitive = namedtuple('Primitive', 'kind geometry style')
+
+    def __init__(self,
+                 cv,
+                 width,
+                 height,
+                 merge_lines=False,
+                 record=False,
+                 stats=False,
+                 on_primitive=None):
+        """ Initialize the turtle.
+
+        :param cv: the canvas that the subclass draws on
+        :param width: canvas width
+        :param height: canvas height
+        :param merge_lines: True if connected segments that share pen colour
+            and width should be drawn as a single shape, instead of a
+            separate line for each segment.
+        :param record: True if the drawing should also be recorded in
+            self.display_list, so it can be replayed at other sizes.
+        :param stats: True if self.stats should count what is drawn, and
+            time the busiest methods.
+        :param on_primitive: a function to call with each primitive that is
+            drawn, like a line, shape, dot, text, or stamp.
+        """
+        self._lines_to_draw = None  # segments of the current fill
+        self._merge_lines = merge_lines
+        self._polyline = []  # [_Segment] connected, but not drawn yet
+        self._converted_position = (None, None)  # (position, (x, y))
+        self._bounds = None  # (left, top, right, bottom) of primitives
+        self.display_list = DisplayList(width, height) if record else None
+        self.stats = DrawingStats() if stats else None
+        self.on_primitive = on_primitive
+        if stats:
+            self._goto = self.stats.timed('_goto', self._goto)
+            self.fill = self.stats.timed('fill', self.fill)
         self.screen = None
         TNavigator.__init__(self)
         TPen.__init__(self)
-        self.screen = self._Screen(drawing, width, height)
+        self.screen = self._Screen(cv, width, height)
         self.stamps = []
         self.__xoff = self.window_width()/2
         self.__yoff = -self.window_height()/2
         self.color('black', 'black')
 
+    def reset(self):
+        """ Move the turtle home with a new pen, and drop unfinished lines. """
+        self._lines_to_draw = None
+        self._polyline = []
+        self._bounds = None
+        if self.display_list is not None:
+            self.display_list = DisplayList(self.window_width(),
+                                            self.window_height())
+        self.stamps = []
+        TNavigator.reset(self)
+        TPen._reset(self)
+        self.color('black', 'black')
+
     def _convert_position(self, position):
         return (round(position[0] + self.__xoff, 3),
                 round(-position[1] - self.__yoff, 3))
 
-    def _goto(self, end):
-        if self.screen:
-            x1, y1 = self._convert_position(self._position)
+    def _go(self, distance):
+        """ Move forward, without TNavigator's Vec2D arithmetic. """
+        x, y = self._position
+        dx, dy = self._orient
+        self._goto(Vec2D(x + dx*distance, y + dy*distance))
+
+    def _rotate(self, angle):
+        """ Turn counterclockwise, exactly for multiples of 90 degrees. """
+        angle = angle * self._degreesPerAU % 360
+        x, y = self._orient
+        if angle == 90:
+            self._orient = Vec2D(-y, x)
+        elif angle == 180:
+            self._orient = Vec2D(-x, -y)
+        elif angle == 270:
+            self._orient = Vec2D(y, -x)
+        elif angle:
+            angle = math.radians(angle)
+            c, s = math.cos(angle), math.sin(angle)
+            self._orient = Vec2D(x*c - y*s, x*s + y*c)
+
+    def _goto(self, end, arc=None):
+        if self.screen and (self._drawing or self._lines_to_draw is not None):
+            position, converted = self._converted_position
+            if position is self._position:
+                x1, y1 = converted
+            else:
+                x1, y1 = self._convert_position(self._position)
             x2, y2 = self._convert_position(end)
+            self._converted_position = (end, (x2, y2))
+            if self._drawing:
+                pencolor = self._pencolor or 0
+                pensize = self._pensize or 0
+            else:
+                pencolor = None
+                pensize = None
+            if self._lines_to_draw is not None:
+                # Lines are drawn with the fill, or by to_svg() if the caller
+                # doesn't call end_fill().
+                self._lines_to_draw.append(self._Segment(x1,
+                                                         y1,
+                                                         x2,
+                                                         y2,
+                                                         pencolor,
+                                                         pensize,
+                                                         arc))
+            elif pencolor is not None:
+                self._draw_line(x1, y1, x2, y2, pencolor, pensize, arc)
+        self._position = end
+
+    def circle(self, radius, extent=None, steps=None):
+        """ Draw a circle or arc as native SVG arcs.
+
+        If steps is given, or the pen is up, fall back to the polygon
+        approximation from TNavigator.
+        """
+        if extent is None:
+            extent = self._fullcircle
+        if steps is not None or not self._drawing or not extent or not radius:
+            super().circle(radius, extent, steps)
+            return
+        angle = extent * self._degreesPerAU
+        if radius < 0:
+            angle = -angle
+        centre = self._position + self._orient.rotate(90) * radius
+        start_offset = self._position - centre
+        sweep_flag = 0 if angle > 0 else 1  # SVG's y axis points down.
+        arc = (round(abs(radius), 3), sweep_flag)
+
+        # An SVG arc can't be a full circle, so split into half circles.
+        piece_count = math.ceil(abs(angle) / 180)
+        for i in range(1, piece_count+1):
+            self._goto(centre + start_offset.rotate(angle * i / piece_count),
+                       arc)
+        self._orient = self._orient.rotate(angle)
+
+    def polyline(self, points):
+        """ Move through a batch of points, like calling goto() on each.
+
+        The points are converted to the canvas all at once, and lines drawn
+        with the pen down become a single shape, so this is much faster than
+        separate goto() calls.
+        :param points: a sequence of (x, y) pairs, or a NumPy array with
+            shape (n, 2)
+        """
+        if not len(points):
+            return
+        if hasattr(points, 'tolist'):
+            end = Vec2D(*points[-1].tolist())
+            converted = points * (1, -1) + (self.__xoff, -self.__yoff)
+            converted = converted.round(3).tolist()
+        else:
+            end = Vec2D(*points[-1])
+            converted = [self._convert_position(point) for point in points]
+        if self._drawing or self._lines_to_draw is not None:
+            converted.insert(0, self._convert_position(self._position))
             if self._drawing:
                 pencolor = self._pencolor or 0
                 pensize = self._pensize or 0
-                # May draw line twice when filling, but it makes sure that we
-                # still draw line when caller doesn't call end_fill().
-                self._draw_line(x1, y1, x2, y2, pencolor, pensize)
             else:
                 pencolor = None
                 pensize = None
+            segments = [self._Segment(x1, y1, x2, y2, pencolor, pensize, None)
+                        for (x1, y1), (x2, y2) in zip(converted,
+                                                      converted[1:])]
             if self._lines_to_draw is not None:
-                self._lines_to_draw.append((x1,
-                                            y1,
-                                            x2,
-                                            y2,
-                                            pencolor,
-                                            pensize))
+                self._lines_to_draw.extend(segments)
+            else:
+                self._newLine()
+                self._draw('shape',
+                           tuple(segments),
+                           stroke=pencolor,
+                           stroke_width=pensize,
+                           stroke_linecap='round',
+                           stroke_linejoin='round',
+                           fill='none')
         self._position = end
 
-    def _draw_line(self, x1, y1, x2, y2, pencolor, pensize):
-        self.screen.cv.add(self.screen.cv.line((x1, y1),
-                                               (x2, y2),
-                                               stroke=pencolor,
-                                               stroke_width=pensize,
-                                               stroke_linecap='round',
-                                               clip_path='url(#border_clip)'))
+    def _draw_line(self, x1, y1, x2, y2, pencolor, pensize, arc=None):
+        segment = self._Segment(x1, y1, x2, y2, pencolor, pensize, arc)
+        if self._merge_lines:
+            if self._polyline:
+                last_segment = self._polyline[-1]
+                if (last_segment[2:6] !=
+                        (segment.x1, segment.y1, pencolor, pensize)):
+                    self._newLine()
+            self._polyline.append(segment)
+            return
+        if arc is not None:
+            self._draw('shape',
+                       (segment,),
+                       stroke=pencolor,
+                       stroke_width=pensize,
+                       stroke_linecap='round',
+                       fill='none')
+            return
+        self._draw('line',
+                   (segment,),
+                   stroke=pencolor,
+                   stroke_width=pensize,
+                   stroke_linecap='round')
+
+    def _draw(self, kind, geometry, **style):
+        """ Draw a primitive, and record it if there's a display list. """
+        primitive = self._Primitive(kind, geometry, style)
+        if self.stats is not None:
+            self.stats.count_primitive(primitive)
+        if self.on_primitive is not None:
+            self.on_primitive(primitive)
+        if self.display_list is not None:
+            self.display_list.primitives.append(primitive)
+        left, top, right, bottom = _primitive_bounds(primitive)
+        if self._bounds is not None:
+            old_left, old_top, old_right, old_bottom = self._bounds
+            left = min(left, old_left)
+            top = min(top, old_top)
+            right = max(right, old_right)
+            bottom = max(bottom, old_bottom)
+        self._bounds = (left, top, right, bottom)
+        self._render(primitive)
+
+    def bounding_box(self):
+        """ Find the area that has been drawn on, including pen widths.
+
+        Text is estimated from its font size, because the font isn't
+        measured. Lines in a fill that hasn't ended aren't included.
+        :return: (left, top, right, bottom) in canvas coordinates, with the
+            y axis pointing down, or None if nothing has been drawn.
+        """
+        return self._bounds
+
+    def _render(self, primitive):
+        """ Draw a primitive on the canvas. """
+        raise NotImplementedError()
+
+    def replay(self, display_list, scale=1.0, angle=0.0, offset=(0, 0)):
+        """ Draw primitives that another turtle recorded.
+
+        The recorded drawing is scaled and rotated around the centre of its
+        canvas, then moved to the centre of this canvas, plus offset.
+        :param display_list: recorded by a turtle created with record=True
+        :param scale: factor for sizes and distances from the centre
+        :param angle: degrees to rotate counterclockwise, although text is
+            only moved, not rotated.
+        :param offset: (x, y) to move the centre by, in turtle coordinates
+        """
+        self._newLine()
+        for primitive in display_list.transform(self.window_width(),
+                                                self.window_height(),
+                                                scale,
+                                                angle,
+                                                offset):
+            self._draw(primitive.kind, primitive.geometry, **primitive.style)
+
+    def _newLine(self, usePos=True):
+        """ Finish the current polyline, called when pen settings change. """
+        if not self._polyline:
+            return
+        segments = tuple(self._polyline)
+        self._polyline = []
+        self._draw('shape',
+                   segments,
+                   stroke=segments[0].pencolor,
+                   stroke_width=segments[0].pensize,
+                   stroke_linecap='round',
+                   stroke_linejoin='round',
+                   fill='none')
 
     def dot(self, size=None, *color):
+        self._newLine()
         x, y = self._convert_position(self._position)
         if size is not None:
             diameter = size
@@ -108,51 +327,27 @@ class SvgTurtle(TNavigator, TPen):
             pencolor = self._colorstr(color)
         else:
             pencolor = self._pencolor or 0
-        self.screen.cv.add(self.screen.cv.circle((x, y),
-                                                 diameter/2,
-                                                 stroke=pencolor,
-                                                 fill=pencolor,
-                                                 clip_path='url(#border_clip)'))
-
-    def to_svg(self) -> str:
-        self._path = None  # Cancel incomplete fill.
-        self._newLine()
-        self._flush_lines()
-        self._draw_stamps()
+        self._draw('dot', (x, y, diameter), stroke=pencolor, fill=pencolor)
 
-        return self.screen.cv.tostring()
-
-    def save_as(self, filename, pretty=False, indent=2):
-        self.screen.cv.saveas(filename, pretty, indent)
+    def _flush(self):
+        self._flush_lines()  # Cancel incomplete fill.
+        self._draw_stamps()
 
     def _draw_stamps(self):
-        start_pos = self.pos()
-        start_heading = self.heading()
-        start_pensize = self.pensize()
-        start_isdown = self.isdown()
-        self.pensize(1)
+        if not self.stamps:
+            return
+        self._newLine()
         stamps = self.stamps[:]
         self.stamps.clear()
         for stamp in stamps:
-            self.up()
-            self.goto(stamp.pos)
-            self.setheading(stamp.heading)
-            self.color(*stamp.color)
-            self.down()
-            self.begin_fill()
-            self.left(151)
-            self.fd(10.296)
-            self.left(140.8)
-            self.fd(5.385)
-            self.right(43.6)
-            self.fd(5.385)
-            self.setpos(stamp.pos)
-            self.end_fill()
-        self.goto(start_pos)
-        self.setheading(start_heading)
-        self.pensize(start_pensize)
-        if not start_isdown:
-            self.up()
+            x, y = self._convert_position(stamp.pos)
+            pencolor, fillcolor = stamp.color
+            self._draw('stamp',
+                       (x, y, stamp.heading, 1),
+                       fill=fillcolor,
+                       stroke=pencolor,
+                       stroke_width=1,
+                       stroke_linejoin='round')
 
     def begin_fill(self):
         self.fill(True)
@@ -161,29 +356,51 @@ class SvgTurtle(TNavigator, TPen):
         self.fill(False)
 
     def _flush_lines(self):
+        """ Draw the lines of the current fill without filling them. """
         if self._lines_to_draw:
-            for x1, y1, x2, y2, pencolor, pensize in self._lines_to_draw:
-                if pencolor is not None:
-                    self._draw_line(x1, y1, x2, y2, pencolor, pensize)
-        self._draw_stamps()
+            for segment in self._lines_to_draw:
+                if segment.pencolor is not None:
+                    self._draw_line(*segment)
+        self._lines_to_draw = None
+        self._newLine()
 
     def fill(self, flag=None):
         if flag is None:
-            return self._path is not None
-        if self._lines_to_draw:  # TODO: and len(self._path) > 2:
-            points = [line[:2] for line in self._lines_to_draw]
-            points.append(self._lines_to_draw[-1][2:4])
-            self.screen.cv.add(self.screen.cv.polygon(points=points,
-                                                      fill=self._fillcolor,
-                                                      fill_rule='evenodd',
-                                                      clip_path='url(#border_clip)'))
-        self._flush_lines()
-        if not flag:
-            self._path = None
-            self._lines_to_draw = None
-        else:
+            return self._lines_to_draw is not None
+        self._newLine()
+        if self._lines_to_draw:
+            self._draw_fill(self._lines_to_draw)
+        self._lines_to_draw = None
+        self._draw_stamps()
+        if flag:
             self._lines_to_draw = []
 
+    def _draw_fill(self, lines):
+        """ Fill the shape outlined by lines, and draw the lines over it.
+
+        When every line was drawn with the same pen, the fill and outline are
+        written as a single element. Otherwise, the outline is drawn as
+        separate lines on top of the fill.
+        """
+        pens = {(line.pencolor, line.pensize) for line in lines}
+        pencolor, pensize = pens.pop()
+        if pens or pencolor is None:
+            self._draw('shape',
+                       tuple(lines),
+                       fill=self._fillcolor,
+                       fill_rule='evenodd')
+            self._lines_to_draw = lines
+            self._flush_lines()
+            return
+        self._draw('shape',
+                   tuple(lines),
+                   fill=self._fillcolor,
+                   fill_rule='evenodd',
+                   stroke=pencolor,
+                   stroke_width=pensize,
+                   stroke_linecap='round',
+                   stroke_linejoin='round')
+
     def window_width(self):
         return self.screen.window_width()
 
@@ -191,8 +408,10 @@ class SvgTurtle(TNavigator, TPen):
         return self.screen.window_height()
 
     def stamp(self):
-        self.stamps.append(
-            self._Stamp(self.pos(), self.heading(), self.color()))
+        heading = math.degrees(math.atan2(self._orient[1], self._orient[0]))
+        self.stamps.append(self._Stamp(self._position,
+                                       round(heading, 10) % 360,
+                                       (self._pencolor, self._fillcolor)))
         if not self.fill():
             self._draw_stamps()
 
@@ -203,21 +422,10 @@ class SvgTurtle(TNavigator, TPen):
               font=("Helvetica", 8, "normal")):
         if move:
             raise ValueError('move', 'Parameter is not supported.')
-        font_name, font_size, font_style = font
-        font_size *= 1.65
-        style = 'font-family: {}; font-size: {}; font-style: {};'.format(
-            font_name,
-            font_size,
-            font_style)
-
+        self._newLine()
         x, y = self._convert_position(self._position)
         y -= font[1] * 0.45
-        self.screen.cv.add(self.screen.cv.text(arg,
-                                               insert=(x, y),
-                                               text_anchor=ANCHOR_NAMES[align],
-                                               style=style,
-                                               fill=self._pencolor,
-                                               clip_path='url(#border_clip)'))
+        self._draw('text', (arg, x, y, align, font), fill=self._pencolor)
 
     def _colorstr(self, color):
         """Return color string corresponding to args.
@@ -237,10 +445,7 @@ class SvgTurtle(TNavigator, TPen):
             r, g, b = color
         except ValueError:
             return '#000000'
-        r, g, b = [round(255.0*x) for x in (r, g, b)]
-        if not ((0 <= r <= 255) and (0 <= g <= 255) and (0 <= b <= 255)):
-            return '#000000'
-        return "#%02x%02x%02x" % (r, g, b)
+        return rgb_to_hex(r, g, b)
 
     @staticmethod
     def _rgb_value(rgbstr):
@@ -250,13 +455,1438 @@ class SvgTurtle(TNavigator, TPen):
         """ Reverse lookup of _colorstr. """
         if not colorstr.startswith('#'):
             return colorstr
-        itercolors = getattr(color_map, 'iteritems', color_map.items)
-        for name, code in itercolors():
-            if code == colorstr:
-                return name
+        name = color_names.get(colorstr)
+        if name is not None:
+            return name
         return tuple(self._rgb_value(colorstr[2*i+1:2*i+3]) for i in range(3))
 
 
+class SvgTurtle(PrimitiveTurtle):
+    """ Helper class to include turtle graphics within a PDF document. """
+
+    @classmethod
+    def create(cls,
+               width="400px",
+               height="250px",
+               bgcolor=None,
+               stream=None,
+               **options) -> "SvgTurtle":
+        """ Create a turtle with a new drawing.
+
+        :param stream: a text stream to write elements to as they are drawn,
+            instead of building an svgwrite drawing in memory. Call close()
+            to finish the document.
+        :param options: passed on to __init__()
+        """
+        svg_drawing = cls.create_svg(width, height, stream)
+        turtle = cls(svg_drawing, **options)
+        turtle._draw_background(bgcolor)
+        return turtle
+
+    @classmethod
+    def create_svg(cls, width, height, stream=None):
+        if not isinstance(width, str):
+            width = f'{width}px'
+        if not isinstance(height, str):
+            height = f'{height}px'
+        if stream is not None:
+            return SvgStream(stream, size=(width, height))
+        import svgwrite
+
+        # SvgTurtle only writes valid attributes, so skip svgwrite's checks.
+        svg_drawing = svgwrite.Drawing(size=(width, height), debug=False)
+        return svg_drawing
+
+    def __init__(self,
+                 drawing,
+                 width=None,
+                 height=None,
+                 merge_lines=False,
+                 style_classes=False,
+                 record=False,
+                 stats=False,
+                 on_primitive=None,
+                 id_prefix=''):
+        """ Initialize the turtle.
+
+        :param drawing: the svgwrite drawing or SvgStream to add elements to
+        :param width: canvas width, or None to read it from the drawing
+        :param height: canvas height, or None to read it from the drawing
+        :param merge_lines: True if connected segments that share pen colour
+            and width should be written as a single polyline, instead of a
+            separate line element for each segment.
+        :param style_classes: True if pen and fill attributes should be
+            written as shared classes in a style sheet, and all elements
+            clipped by a single group, instead of repeating the attributes on
+            every element.
+        :param record: True if the drawing should also be recorded in
+            self.display_list, so it can be replayed at other sizes.
+        :param stats: True if self.stats should count what is drawn, and
+            time the busiest methods.
+        :param on_primitive: a function to call with each primitive that is
+            drawn, like a line, shape, dot, text, or stamp.
+        :param id_prefix: added to every id and style class that the turtle
+            writes, so drawings from several turtles can be combined. See
+            SvgLayers.
+        """
+        if width is None:
+            width = _parse_int(drawing['width'])
+        if height is None:
+            height = _parse_int(drawing['height'])
+        self._id_prefix = id_prefix
+        clip_id = id_prefix + 'border_clip'
+        self._clip_url = 'url(#{})'.format(clip_id)
+        clip_path = drawing.defs.add(drawing.clipPath(id=clip_id))
+        clip_path.add(drawing.rect(size=(width, height)))
+        if style_classes:
+            self._style_classes = {}  # {((name, value), ...): class_name}
+            self._style_sheet = drawing.defs.add(drawing.style())
+            self._container = drawing.add(drawing.g(clip_path=self._clip_url))
+        else:
+            self._style_classes = None
+            self._style_sheet = None
+            self._container = drawing
+        self._reusable_primitives = None  # [_Primitive] drawn in reusable()
+        self._reusable_ids = {}  # {relative primitives, rounded: id}
+        self._has_stamp_shape = False  # True after it's added to defs
+        self._uncropped_size = None  # (width, height) before crop()
+        super().__init__(drawing,
+                         width,
+                         height,
+                         merge_lines,
+                         record,
+                         stats,
+                         on_primitive)
+        if stats:
+            self.to_svg = self.stats.timed('to_svg', self.to_svg)
+
+    def _draw_background(self, bgcolor):
+        if bgcolor is not None:
+            bgcolor_str = self._colorstr(bgcolor)
+            # Not 100%, because that would follow the viewBox after crop().
+            size = (self.window_width(), self.window_height())
+            self._add(self.screen.cv.rect(size=size), fill=bgcolor_str)
+
+    def reset(self, bgcolor=None):
+        """ Clear the drawing and move the turtle home with a new pen.
+
+        The canvas, its size, and the clip path are kept, so the turtle can
+        draw another file without building a new drawing. Drawings that
+        were created with a stream can't be reset.
+        :param bgcolor: a colour to fill the cleared canvas with, or None
+        """
+        cv = self.screen.cv
+        if isinstance(cv, SvgStream):
+            raise ValueError('Streamed drawings cannot be reset.')
+        del cv.defs.elements[1:]  # Keep the clip path.
+        if self._style_classes is None:
+            del cv.elements[1:]  # Keep the defs.
+        else:
+            self._style_classes.clear()
+            self._style_sheet = cv.defs.add(cv.style())
+            del self._container.elements[:]
+        self._reusable_primitives = None
+        self._reusable_ids.clear()
+        self._has_stamp_shape = False
+        if self._uncropped_size is not None:
+            del cv.attribs['viewBox']
+            cv['width'], cv['height'] = self._uncropped_size
+            self._uncropped_size = None
+        super().reset()
+        self._draw_background(bgcolor)
+
+    def _render(self, primitive):
+        if self._reusable_primitives is not None:
+            self._reusable_primitives.append(primitive)
+            return
+        element = self._create_element(primitive.kind, primitive.geometry)
+        # Don't clip stamps, because the clip path would turn with them.
+        self._add(element, clip=primitive.kind != 'stamp', **primitive.style)
+
+    @contextmanager
+    def reusable(self):
+        """ Mark a sub-drawing that might be repeated at other positions.
+
+        Everything drawn in the with block is compared with earlier reusable
+        blocks, relative to the turtle's starting position. The first copy
+        of each shape is written once in defs, and every copy is drawn with
+        a use element.
+        """
+        if self._reusable_primitives is not None:
+            # Already inside a reusable block.
+            yield
+            return
+        self._newLine()
+        x, y = self._convert_position(self._position)
+        self._reusable_primitives = []
+        try:
+            yield
+            self._newLine()
+        finally:
+            primitives = DisplayList(0, 0)
+            primitives.primitives = self._reusable_primitives
+            self._reusable_primitives = None
+        if not primitives.primitives:
+            return
+        # Match on 2 places, so rounding errors don't hide matches.
+        key = tuple(
+            primitive._replace(style=tuple(sorted(primitive.style.items())))
+            for primitive in primitives.transform(0,
+                                                  0,
+                                                  offset=(-x, y),
+                                                  digits=2))
+        reusable_id = self._reusable_ids.get(key)
+        if reusable_id is None:
+            reusable_id = '{}reusable{}'.format(self._id_prefix,
+                                                len(self._reusable_ids))
+            self._reusable_ids[key] = reusable_id
+            cv = self.screen.cv
+            group = cv.defs.add(cv.g(id=reusable_id))
+            # Write the first copy at full precision, like other elements.
+            for primitive in primitives.transform(0, 0, offset=(-x, y)):
+                element = self._create_element(primitive.kind,
+                                               primitive.geometry)
+                self._set_style(element, primitive.style)
+                group.add(element)
+        # Don't clip the use element, because its clip path would move with
+        # it. The canvas still clips it to the same border.
+        self._add(self.screen.cv.use('#' + reusable_id, insert=(x, y)),
+                  clip=False)
+
+    def _create_element(self, kind, geometry):
+        """ Create an element for a primitive, without presentation.
+
+        :param kind: 'line' for a tuple with one straight segment, 'shape'
+            for a tuple of connected segments, 'dot' for (x, y, diameter),
+            'text' for (text, x, y, align, font), or 'stamp' for
+            (x, y, heading, scale).
+        :param geometry: the position and size of the primitive
+        """
+        if kind == 'stamp':
+            return self._create_stamp(*geometry)
+        if kind == 'line':
+            segment, = geometry
+            return self.screen.cv.line((segment.x1, segment.y1),
+                                       (segment.x2, segment.y2))
+        if kind == 'shape':
+            return self._create_shape(geometry)
+        if kind == 'dot':
+            x, y, diameter = geometry
+            return self.screen.cv.circle((x, y), diameter/2)
+        text, x, y, align, font = geometry
+        font_name, font_size, font_style = font
+        font_size *= 1.65
+        style = 'font-family: {}; font-size: {}; font-style: {};'.format(
+            font_name,
+            font_size,
+            font_style)
+        return self.screen.cv.text(text,
+                                   insert=(x, y),
+                                   text_anchor=ANCHOR_NAMES[align],
+                                   style=style)
+
+    def _create_stamp(self, x, y, heading, scale):
+        """ Create a use element that points to the stamp shape in defs. """
+        cv = self.screen.cv
+        if not self._has_stamp_shape:
+            cv.defs.add(cv.polygon(self._STAMP_POINTS,
+                                   id=self._id_prefix + 'stamp'))
+            self._has_stamp_shape = True
+        transform = 'translate({},{}) rotate({})'.format(
+            x,
+            y,
+            round(-heading, 3) or 0)
+        if scale != 1:
+            transform += ' scale({})'.format(scale)
+        return cv.use('#{}stamp'.format(self._id_prefix), transform=transform)
+
+    def _add(self, element, clip=True, **style):
+        """ Add an element to the drawing with presentation attributes.
+
+        In style class mode, the attributes are replaced with a class that is
+        shared by every element with the same attributes.
+        :param clip: False if the element shouldn't get the border clip path
+        """
+        self._set_style(element, style)
+        if clip and self._style_classes is None:
+            element['clip-path'] = self._clip_url
+        self._container.add(element)
+        if self.stats is not None:
+            self.stats.element_count += 1
+
+    def _set_style(self, element, style):
+        if self._style_classes is None:
+            element.update(style)
+        elif style:
+            element['class'] = self._find_style_class(style)
+
+    def _find_style_class(self, style):
+        """ Find or create a style class with the presentation attributes. """
+        key = tuple(sorted((name.replace('_', '-'), value)
+                           for name, value in style.items()))
+        class_name = self._style_classes.get(key)
+        if class_name is None:
+            class_name = '{}s{}'.format(self._id_prefix,
+                                        len(self._style_classes))
+            self._style_classes[key] = class_name
+            rules = ';'.join(
+                '{}:{}px'.format(name, value) if name == 'stroke-width'
+                else '{}:{}'.format(name, value)
+                for name, value in key)
+            self._style_sheet.append('.{}{{{}}}'.format(class_name, rules))
+        return class_name
+
+    def _create_shape(self, segments):
+        """ Create an element that follows a list of connected segments.
+
+        Straight segments make a polyline, or a polygon if they end where
+        they started. Arcs need a path.
+        """
+        start = segments[0][:2]
+        end = segments[-1][2:4]
+        is_closed = start == end
+        if all(segment.arc is None for segment in segments):
+            points = [segment[:2] for segment in segments]
+            if is_closed:
+                return self.screen.cv.polygon(points)
+            points.append(end)
+            return self.screen.cv.polyline(points)
+        commands = ['M{},{}'.format(*start)]
+        for segment in segments:
+            if segment.arc is None:
+                commands.append('L{},{}'.format(segment.x2, segment.y2))
+            else:
+                radius, sweep_flag = segment.arc
+                commands.append('A{0},{0} 0 0,{1} {2},{3}'.format(
+                    radius,
+                    sweep_flag,
+                    segment.x2,
+                    segment.y2))
+        if is_closed:
+            commands.append('Z')
+        return self.screen.cv.path(' '.join(commands))
+
+    def crop(self, padding=0):
+        """ Shrink the canvas to the bounding box of the drawing.
+
+        The SVG gets a viewBox, so it scales to whatever size it's shown at,
+        and its width and height become the size of the box. The box never
+        extends past the canvas. Call this when the drawing is finished.
+        :param padding: space to add around the bounding box
+        """
+        self._flush()
+        cv = self.screen.cv
+        if isinstance(cv, SvgStream):
+            raise ValueError('Streamed drawings cannot be cropped.')
+        box = self.bounding_box()
+        if box is None:
+            return
+        left, top, right, bottom = box
+        left = round(max(left - padding, 0), 3)
+        top = round(max(top - padding, 0), 3)
+        width = round(min(right + padding, self.window_width()) - left, 3)
+        height = round(min(bottom + padding, self.window_height()) - top, 3)
+        if self._uncropped_size is None:
+            self._uncropped_size = (cv['width'], cv['height'])
+        cv.viewbox(left, top, width, height)
+        cv['width'] = f'{width}px'
+        cv['height'] = f'{height}px'
+
+    def to_svg(self, optimizer=None) -> str:
+        """ Serialize the drawing.
+
+        :param optimizer: an SvgOptimizer to shrink the text with, or None
+        """
+        self._flush()
+        svg = self.screen.cv.tostring()
+        if optimizer is not None:
+            svg = optimizer.optimize(svg)
+        if self.stats is not None:
+            self.stats.bytes_serialized += len(svg.encode('utf-8'))
+        return svg
+
+    def to_layer(self) -> "SvgLayer":
+        """ Serialize the drawing as a layer for SvgLayers.compose(). """
+        self._flush()
+        cv = self.screen.cv
+        if isinstance(cv, SvgStream):
+            raise ValueError('Streamed drawings cannot be layers.')
+        return SvgLayer(
+            self._id_prefix,
+            ''.join(element.tostring() for element in cv.defs.elements),
+            ''.join(element.tostring() for element in cv.elements[1:]))
+
+    def save_as(self, filename, pretty=False, indent=2, optimizer=None):
+        """ Write the drawing to a file.
+
+        :param optimizer: an SvgOptimizer to shrink the text with, or None.
+            The optimized text is never pretty printed.
+        """
+        if optimizer is not None:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(self.to_svg(optimizer))
+            return
+        self._flush()
+        self.screen.cv.saveas(filename, pretty, indent)
+        if self.stats is not None:
+            self.stats.bytes_serialized += os.path.getsize(filename)
+
+    def to_png(self, width=None, scale=1, write_to=None):
+        """ Rasterize the drawing without writing an SVG file.
+
+        :param width: output width in pixels, or None to use the canvas
+            width times scale. Height keeps the same aspect ratio.
+        :param scale: factor for the canvas size, if width is None
+        :param write_to: a file name or binary stream to write to, or None
+            to return the PNG bytes
+        """
+        from cairosvg import svg2png
+
+        return svg2png(bytestring=self.to_svg().encode('utf-8'),
+                       write_to=write_to,
+                       output_width=width,
+                       scale=scale)
+
+    def to_pngs(self, sizes):
+        """ Rasterize the drawing at several sizes, parsing the SVG once.
+
+        :param sizes: output widths in pixels, like 32, or scale factors for
+            the canvas size, like '@2x'
+        :return: {size: png_bytes} for each of the sizes
+        """
+        from cairosvg.parser import Tree
+        from cairosvg.surface import PNGSurface
+
+        tree = Tree(bytestring=self.to_svg().encode('utf-8'))
+        pngs = {}
+        for size in sizes:
+            if isinstance(size, str):
+                scale = float(size.lstrip('@').rstrip('x'))
+                width = None
+            else:
+                scale = 1
+                width = size
+            output = BytesIO()
+            surface = PNGSurface(tree,
+                                 output,
+                                 dpi=96,
+                                 scale=scale,
+                                 output_width=width)
+            surface.finish()
+            pngs[size] = output.getvalue()
+        return pngs
+
+    def close(self):
+        """ Finish writing a drawing that was created with a stream. """
+        self._flush()
+        self.screen.cv.close()
+
+
+class CairoTurtle(PrimitiveTurtle):
+    """ Turtle that draws straight onto a cairocffi image surface.
+
+    It draws the same primitives as SvgTurtle, so drawing functions can make
+    PNG files without writing and parsing SVG.
+    """
+    @classmethod
+    def create(cls,
+               width="400px",
+               height="250px",
+               bgcolor=None,
+               scale=1,
+               **options) -> "CairoTurtle":
+        """ Create a turtle with a new image surface.
+
+        :param scale: pixels in the image for each unit of turtle distance
+        :param options: passed on to __init__()
+        """
+        import cairocffi as cairo
+
+        if isinstance(width, str):
+            width = _parse_int(width)
+        if isinstance(height, str):
+            height = _parse_int(height)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                     math.ceil(width*scale),
+                                     math.ceil(height*scale))
+        context = cairo.Context(surface)
+        context.scale(scale, scale)
+        turtle = cls(context, width, height, **options)
+        turtle._draw_background(bgcolor)
+        return turtle
+
+    def __init__(self,
+                 context,
+                 width,
+                 height,
+                 merge_lines=False,
+                 record=False,
+                 stats=False,
+                 on_primitive=None):
+        """ Initialize the turtle.
+
+        :param context: the cairo context to draw with. Its surface should
+            be an image surface, if you want to call to_png().
+        :param width: canvas width, in turtle units
+        :param height: canvas height, in turtle units
+        See PrimitiveTurtle for the other parameters.
+        """
+        import cairocffi as cairo
+
+        self._cairo = cairo
+        super().__init__(context,
+                         width,
+                         height,
+                         merge_lines,
+                         record,
+                         stats,
+                         on_primitive)
+        if stats:
+            self.to_png = self.stats.timed('to_png', self.to_png)
+
+    def _draw_background(self, bgcolor):
+        if bgcolor is not None:
+            context = self.screen.cv
+            context.set_source_rgb(*hex_to_rgb(self._colorstr(bgcolor)))
+            context.paint()
+
+    def reset(self, bgcolor=None):
+        """ Clear the image and move the turtle home with a new pen.
+
+        :param bgcolor: a colour to fill the cleared image with, or None
+        """
+        context = self.screen.cv
+        context.save()
+        context.set_operator(self._cairo.OPERATOR_CLEAR)
+        context.paint()
+        context.restore()
+        super().reset()
+        self._draw_background(bgcolor)
+
+    def _render(self, primitive):
+        context = self.screen.cv
+        kind, geometry, style = primitive
+        if kind == 'text':
+            self._render_text(*geometry, **style)
+            return
+        context.save()
+        if kind in ('line', 'shape'):
+            trace_segments(context, geometry)
+        elif kind == 'dot':
+            x, y, diameter = geometry
+            context.arc(x, y, diameter/2, 0, 2*math.pi)
+        else:
+            x, y, heading, scale = geometry
+            context.translate(x, y)
+            context.rotate(math.radians(-heading))
+            context.scale(scale, scale)
+            context.move_to(*self._STAMP_POINTS[0])
+            for point in self._STAMP_POINTS[1:]:
+                context.line_to(*point)
+            context.close_path()
+        self._paint(kind, **style)
+        context.restore()
+
+    def _paint(self, kind, **style):
+        """ Fill and stroke the current path, see find_paint(). """
+        cairo = self._cairo
+        context = self.screen.cv
+        paint = find_paint(kind, **style)
+        if paint.fill is not None:
+            context.set_source_rgb(*paint.fill)
+            context.set_fill_rule(cairo.FILL_RULE_EVEN_ODD
+                                  if paint.even_odd
+                                  else cairo.FILL_RULE_WINDING)
+            context.fill_preserve()
+        if paint.stroke is not None:
+            context.set_source_rgb(*paint.stroke)
+            context.set_line_width(paint.stroke_width)
+            context.set_line_cap(dict(butt=cairo.LINE_CAP_BUTT,
+                                      round=cairo.LINE_CAP_ROUND,
+                                      square=cairo.LINE_CAP_SQUARE)[
+                paint.linecap])
+            context.set_line_join(dict(miter=cairo.LINE_JOIN_MITER,
+                                       round=cairo.LINE_JOIN_ROUND,
+                                       bevel=cairo.LINE_JOIN_BEVEL)[
+                paint.linejoin])
+            context.stroke_preserve()
+        context.new_path()
+
+    def _render_text(self, text, x, y, align, font, fill='#000000'):
+        cairo = self._cairo
+        context = self.screen.cv
+        font_name, font_size, font_style = font
+        context.select_font_face(font_name,
+                                 cairo.FONT_SLANT_ITALIC
+                                 if 'italic' in font_style
+                                 else cairo.FONT_SLANT_NORMAL,
+                                 cairo.FONT_WEIGHT_BOLD
+                                 if 'bold' in font_style
+                                 else cairo.FONT_WEIGHT_NORMAL)
+        context.set_font_size(font_size * 1.65)
+        # cairocffi returns a plain tuple, with x_advance fifth.
+        width = context.text_extents(text)[4]
+        x -= dict(left=0, center=width/2, right=width)[align]
+        context.set_source_rgb(*hex_to_rgb(fill))
+        context.move_to(x, y)
+        context.show_text(text)
+        context.new_path()
+
+    def to_png(self, write_to=None):
+        """ Write the image as a PNG.
+
+        :param write_to: a file name or binary stream to write to, or None
+            to return the PNG bytes
+        """
+        self._flush()
+        surface = self.screen.cv.get_target()
+        if write_to is None:
+            output = BytesIO()
+            surface.write_to_png(output)
+            return output.getvalue()
+        if not hasattr(write_to, 'write'):
+            write_to = str(write_to)
+        surface.write_to_png(write_to)
+
+    def save_as(self, filename):
+        self.to_png(write_to=filename)
+
+
+class RecordingTurtle(PrimitiveTurtle):
+    """ Turtle that only records a display list, without drawing it.
+
+    Use it to capture a drawing for replay() or PDF sheets, without paying
+    for SVG elements.
+    """
+    @classmethod
+    def create(cls,
+               width="400px",
+               height="250px",
+               **options) -> "RecordingTurtle":
+        """ Create a turtle for a canvas size.
+
+        :param options: passed on to PrimitiveTurtle.__init__()
+        """
+        if isinstance(width, str):
+            width = _parse_int(width)
+        if isinstance(height, str):
+            height = _parse_int(height)
+        return cls(None, width, height, record=True, **options)
+
+    def _render(self, primitive):
+        pass
+
+    def finish(self) -> "DisplayList":
+        """ Draw any waiting stamps and lines, then return the record. """
+        self._flush()
+        return self.display_list
+
+
+class SvgTurtlePool:
+    """ Lend out turtles of one size to draw a batch of files.
+
+    Each turtle is reset when it's returned, instead of building a new
+    drawing for every file::
+
+        pool = SvgTurtlePool("64px", "64px")
+        for path in paths:
+            with pool.turtle() as turtle:
+                turtle.forward(10)
+                turtle.save_as(path)
+    """
+    def __init__(self,
+                 width="400px",
+                 height="250px",
+                 bgcolor=None,
+                 **options):
+        """ Initialize the pool.
+
+        :param options: passed on to SvgTurtle.__init__()
+        """
+        self.width = width
+        self.height = height
+        self.bgcolor = bgcolor
+        self.options = options
+        self._idle_turtles = []
+
+    @contextmanager
+    def turtle(self):
+        """ Borrow a clean turtle for the with block. """
+        if self._idle_turtles:
+            turtle = self._idle_turtles.pop()
+        else:
+            turtle = SvgTurtle.create(self.width,
+                                      self.height,
+                                      self.bgcolor,
+                                      **self.options)
+        try:
+            yield turtle
+        finally:
+            turtle.reset(self.bgcolor)
+            self._idle_turtles.append(turtle)
+
+
+# defs and body are serialized elements, and id_prefix is the turtle's.
+SvgLayer = namedtuple('SvgLayer', 'id_prefix defs body')
+
+
+class SvgLayers:
+    """ Draw the layers of one picture separately, then compose them.
+
+    Each layer's turtle gets its own id prefix, so the layers can be drawn
+    in separate processes and merged without clashing ids::
+
+        layers = SvgLayers(172, 172)
+        svg = layers.render([(draw_background, ()),
+                             (draw_grid, (12,)),
+                             (draw_pieces, (pieces,))])
+
+    The drawing functions must be defined at module level, so other
+    processes can find them.
+    """
+    def __init__(self, width="400px", height="250px", bgcolor=None, **options):
+        """ Initialize the layers.
+
+        :param bgcolor: a colour to fill the bottom layer with, or None
+        :param options: passed on to SvgTurtle.__init__() for each layer
+        """
+        self.width = width
+        self.height = height
+        self.bgcolor = bgcolor
+        self.options = options
+
+    def create_turtle(self, layer_id, bgcolor=None) -> SvgTurtle:
+        """ Create a turtle for one layer.
+
+        :param layer_id: unique within the picture, and valid as an XML id
+        :param bgcolor: a colour to fill the layer with, or None
+        """
+        return SvgTurtle.create(self.width,
+                                self.height,
+                                bgcolor,
+                                id_prefix=layer_id + '_',
+                                **self.options)
+
+    def render(self, jobs, processes=None) -> str:
+        """ Draw all the layers, and compose them.
+
+        :param jobs: [(function, args)] in z-order, from bottom to top. Each
+            function is called with a new turtle and the args.
+        :param processes: the number of worker processes, None for one per
+            CPU, or 1 to draw every layer in this process.
+        """
+        calls = [(self,
+                  'layer{}'.format(i),
+                  self.bgcolor if i == 0 else None,
+                  function,
+                  args)
+                 for i, (function, args) in enumerate(jobs)]
+        if processes == 1:
+            layers = [_draw_layer(*call) for call in calls]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(processes) as executor:
+                layers = list(executor.map(_draw_layer, *zip(*calls)))
+        return self.compose(layers)
+
+    def compose(self, layers) -> str:
+        """ Merge layers into one SVG document, in z-order.
+
+        :param layers: SvgLayer objects from SvgTurtle.to_layer(), from
+            bottom to top
+        """
+        width = self.width
+        height = self.height
+        if not isinstance(width, str):
+            width = f'{width}px'
+        if not isinstance(height, str):
+            height = f'{height}px'
+        parts = [_svg_start_tag(width, height), '<defs>']
+        parts.extend(layer.defs for layer in layers)
+        parts.append('</defs>')
+        parts.extend(layer.body for layer in layers)
+        parts.append('</svg>')
+        return ''.join(parts)
+
+
+def _draw_layer(layers, layer_id, bgcolor, function, args):
+    turtle = layers.create_turtle(layer_id, bgcolor)
+    function(turtle, *args)
+    return turtle.to_layer()
+
+
+class DrawingStats:
+    """ Counts and timings for what an SvgTurtle has drawn.
+
+    Stats keep adding up when the turtle is reset, so compare the values
+    before and after a call to see what that call cost.
+    """
+    def __init__(self):
+        self.segment_count = 0  # lines and arcs, including fill outlines
+        self.fill_count = 0
+        self.element_count = 0  # elements added to the drawing
+        self.bytes_serialized = 0
+        self.primitive_counts = Counter()  # {kind: count}
+        self.times = defaultdict(float)  # {method name: seconds}
+
+    @property
+    def shape_count(self):
+        """ Polygons, polylines, and paths. """
+        return self.primitive_counts['shape']
+
+    @property
+    def dot_count(self):
+        return self.primitive_counts['dot']
+
+    def count_primitive(self, primitive):
+        self.primitive_counts[primitive.kind] += 1
+        if primitive.kind in ('line', 'shape'):
+            self.segment_count += len(primitive.geometry)
+            if primitive.style.get('fill', 'none') != 'none':
+                self.fill_count += 1
+
+    def timed(self, name, method):
+        """ Wrap a method to add up the time spent in it. """
+        times = self.times
+
+        def timed_method(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times[name] += perf_counter() - start
+        return timed_method
+
+    def as_dict(self):
+        return dict(segment_count=self.segment_count,
+                    shape_count=self.shape_count,
+                    fill_count=self.fill_count,
+                    dot_count=self.dot_count,
+                    element_count=self.element_count,
+                    bytes_serialized=self.bytes_serialized,
+                    primitive_counts=dict(self.primitive_counts),
+                    times=dict(self.times))
+
+    def report(self):
+        lines = ['{} segments, {} shapes, {} fills, {} dots.'.format(
+                    self.segment_count,
+                    self.shape_count,
+                    self.fill_count,
+                    self.dot_count),
+                 '{} elements, {:,} bytes.'.format(self.element_count,
+                                                  self.bytes_serialized)]
+        lines.extend('{}: {:.3f}s'.format(name, seconds)
+                     for name, seconds in sorted(self.times.items()))
+        return '\n'.join(lines)
+
+
+class DisplayList:
+    """ Drawing primitives recorded by SvgTurtle, to replay at other sizes.
+
+    Coordinates are in the SVG canvas that they were recorded on.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.primitives = []
+
+    def transform(self,
+                  width,
+                  height,
+                  scale=1.0,
+                  angle=0.0,
+                  offset=(0, 0),
+                  digits=3):
+        """ Generate the primitives, transformed for another canvas.
+
+        See SvgTurtle.replay() for the parameters, and digits is the number
+        of decimal places to round to.
+        """
+        cos_scale = math.cos(math.radians(angle)) * scale
+        sin_scale = math.sin(math.radians(angle)) * scale
+        x_centre = width/2 + offset[0]
+        y_centre = height/2 - offset[1]  # SVG's y axis points down.
+
+        def convert(x, y):
+            dx = x - self.width/2
+            dy = y - self.height/2
+            return (round(x_centre + dx*cos_scale + dy*sin_scale, digits),
+                    round(y_centre - dx*sin_scale + dy*cos_scale, digits))
+
+        for primitive in self.primitives:
+            style = dict(primitive.style)
+            # A stamp's transform already scales its outline.
+            if 'stroke_width' in style and primitive.kind != 'stamp':
+                style['stroke_width'] = round(style['stroke_width']*scale,
+                                              digits)
+            if primitive.kind in ('line', 'shape'):
+                geometry = []
+                for segment in primitive.geometry:
+                    x1, y1 = convert(segment.x1, segment.y1)
+                    x2, y2 = convert(segment.x2, segment.y2)
+                    pensize = segment.pensize
+                    if pensize is not None:
+                        pensize = round(pensize*scale, digits)
+                    arc = segment.arc
+                    if arc is not None:
+                        radius, sweep_flag = arc
+                        arc = (round(radius*scale, digits), sweep_flag)
+                    geometry.append(segment._replace(x1=x1,
+                                                     y1=y1,
+                                                     x2=x2,
+                                                     y2=y2,
+                                                     pensize=pensize,
+                                                     arc=arc))
+                geometry = tuple(geometry)
+            elif primitive.kind == 'dot':
+                x, y, diameter = primitive.geometry
+                geometry = convert(x, y) + (round(diameter*scale, digits),)
+            elif primitive.kind == 'stamp':
+                x, y, heading, stamp_scale = primitive.geometry
+                geometry = convert(x, y) + (
+                    round((heading + angle) % 360, digits),
+                    round(stamp_scale*scale, digits))
+            else:
+                text, x, y, align, font = primitive.geometry
+                font_name, font_size, font_style = font
+                font = (font_name, round(font_size*scale, digits), font_style)
+                geometry = (text,) + convert(x, y) + (align, font)
+            yield primitive._replace(geometry=geometry, style=style)
+
+
+class SvgStream:
+    """ Write SVG elements to a text stream as they are added.
+
+    Supports the parts of svgwrite.Drawing that SvgTurtle uses, without
+    building a document tree or validating attributes. Elements added to
+    defs are kept until close() writes them at the end of the document.
+    """
+    def __init__(self, stream, size=('100%', '100%')):
+        self.stream = stream
+        width, height = size
+        self.attribs = dict(width=width, height=height)
+        self.defs = _StreamElement(self, 'defs')
+        self._open_groups = []
+        self._is_closed = False
+        stream.write(_svg_start_tag(width, height))
+
+    def __getitem__(self, key):
+        return self.attribs[key]
+
+    def add(self, element):
+        self._close_groups(0)
+        return self._write(element)
+
+    def _write(self, element):
+        if element.name == 'g':
+            self.stream.write(element.start_tag())
+            self._open_groups.append(element)
+            element.is_open = True
+        else:
+            self.stream.write(element.to_xml())
+        return element
+
+    def _close_groups(self, depth):
+        while len(self._open_groups) > depth:
+            self._open_groups.pop().is_open = False
+            self.stream.write('</g>')
+
+    def _add_to_group(self, group, element):
+        self._close_groups(self._open_groups.index(group) + 1)
+        return self._write(element)
+
+    def close(self):
+        """ Finish the document. Doesn't close the stream. """
+        if self._is_closed:
+            return
+        self._close_groups(0)
+        if self.defs.elements:
+            self.stream.write(self.defs.to_xml())
+        self.stream.write('</svg>')
+        self._is_closed = True
+
+    def tostring(self):
+        """ Finish the document, and return it from an in-memory stream.
+
+        Other streams, like files, can't be read back, so call close()
+        instead of serializing them.
+        """
+        self.close()
+        try:
+            get_value = self.stream.getvalue
+        except AttributeError:
+            raise ValueError('Only drawings streamed to memory, like a '
+                             'StringIO, can be serialized. Call close() to '
+                             'finish other streams.') from None
+        return get_value()
+
+    def saveas(self, filename, pretty=False, indent=2):
+        """ Finish the document, and copy it from an in-memory stream. """
+        svg = self.tostring()
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(svg)
+
+    def clipPath(self, **extra):
+        return _StreamElement(self, 'clipPath', **extra)
+
+    def style(self, content=''):
+        return _StreamElement(self, 'style', content, type='text/css')
+
+    def g(self, **extra):
+        return _StreamElement(self, 'g', **extra)
+
+    def rect(self, insert=(0, 0), size=(1, 1), **extra):
+        x, y = insert
+        width, height = size
+        return _StreamElement(self,
+                              'rect',
+                              x=x,
+                              y=y,
+                              width=width,
+                              height=height,
+                              **extra)
+
+    def line(self, start=(0, 0), end=(0, 0), **extra):
+        x1, y1 = start
+        x2, y2 = end
+        return _StreamElement(self,
+                              'line',
+                              x1=x1,
+                              y1=y1,
+                              x2=x2,
+                              y2=y2,
+                              **extra)
+
+    def polyline(self, points=(), **extra):
+        return _StreamElement(self,
+                              'polyline',
+                              points=_points_str(points),
+                              **extra)
+
+    def polygon(self, points=(), **extra):
+        return _StreamElement(self,
+                              'polygon',
+                              points=_points_str(points),
+                              **extra)
+
+    def path(self, d=None, **extra):
+        return _StreamElement(self, 'path', d=d, **extra)
+
+    def use(self, href, insert=None, **extra):
+        if insert is not None:
+            extra['x'], extra['y'] = insert
+        extra['xlink:href'] = href
+        return _StreamElement(self, 'use', **extra)
+
+    def circle(self, center=(0, 0), r=1, **extra):
+        cx, cy = center
+        return _StreamElement(self, 'circle', cx=cx, cy=cy, r=r, **extra)
+
+    def text(self, text, insert=None, **extra):
+        from xml.sax.saxutils import escape
+
+        if insert is not None:
+            extra['x'], extra['y'] = insert
+        return _StreamElement(self, 'text', escape(text), **extra)
+
+
+class _StreamElement:
+    """ An element for SvgStream that serializes itself. """
+    def __init__(self, drawing, name, content='', **extra):
+        self.drawing = drawing
+        self.name = name
+        self.content = content
+        self.attribs = {}
+        self.elements = []
+        self.is_open = False
+        self.update(extra)
+
+    def __setitem__(self, key, value):
+        self.attribs[key] = value
+
+    def __getitem__(self, key):
+        return self.attribs[key]
+
+    def update(self, attribs):
+        for key, value in attribs.items():
+            self.attribs[key.rstrip('_').replace('_', '-')] = value
+
+    def add(self, element):
+        if self.is_open:
+            return self.drawing._add_to_group(self, element)
+        self.elements.append(element)
+        return element
+
+    def append(self, content):
+        self.content += content
+
+    def start_tag(self):
+        from xml.sax.saxutils import quoteattr
+
+        attribs = ''.join(' {}={}'.format(key, quoteattr(str(value)))
+                          for key, value in sorted(self.attribs.items())
+                          if value is not None)
+        return '<{}{}>'.format(self.name, attribs)
+
+    def to_xml(self):
+        start_tag = self.start_tag()
+        if self.name == 'style':
+            if not self.content:
+                return ''
+            return '{}<![CDATA[{}]]></style>'.format(start_tag, self.content)
+        children = ''.join(element.to_xml() for element in self.elements)
+        if not (children or self.content):
+            return start_tag[:-1] + ' />'
+        return '{}{}{}</{}>'.format(start_tag,
+                                    self.content,
+                                    children,
+                                    self.name)
+
+
+class SvgOptimizer:
+    """ Shrink SVG text that SvgTurtle wrote.
+
+    Numbers are rounded to a fixed precision, with trailing zeros removed.
+    Path commands are made relative where that's shorter, and attributes
+    with default values are removed. That includes the border clip path,
+    because the canvas clips to the same border, unless the SVG has a
+    viewBox. A viewBox can show past the border when the aspect ratio
+    doesn't match. It relies on SvgTurtle never setting presentation
+    attributes on a parent element.
+    Sizes are totalled over all the calls to optimize(), see report().
+    """
+    NUMBER_PATTERN = r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+    NUMBER_ATTRIBUTES = {'x', 'y', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'r',
+                         'width', 'height', 'stroke-width', 'points', 'd',
+                         'viewBox'}
+    DEFAULT_ATTRIBUTES = {('baseProfile', 'full'),
+                          ('version', '1.1'),
+                          ('x', '0'),
+                          ('y', '0'),
+                          ('stroke-width', '1'),
+                          ('clip-path', 'url(#border_clip)')}
+    PATH_ARGUMENT_COUNTS = dict(M=2, L=2, A=7, Z=0)
+
+    def __init__(self, precision=3, relative_paths=True):
+        """ Initialize the optimizer.
+
+        :param precision: decimal places to keep in coordinates
+        :param relative_paths: True if path commands may be made relative
+        """
+        self.precision = precision
+        self.relative_paths = relative_paths
+        self.original_size = 0
+        self.optimized_size = 0
+        self._has_viewbox = False
+
+    @property
+    def bytes_saved(self):
+        return self.original_size - self.optimized_size
+
+    def update(self, other: 'SvgOptimizer'):
+        """ Add the sizes from another optimizer, like one in a worker. """
+        self.original_size += other.original_size
+        self.optimized_size += other.optimized_size
+
+    def report(self):
+        if not self.original_size:
+            return 'Nothing optimized.'
+        return 'Saved {:,} of {:,} bytes ({:.0%}).'.format(
+            self.bytes_saved,
+            self.original_size,
+            self.bytes_saved / self.original_size)
+
+    def optimize(self, svg: str) -> str:
+        self._has_viewbox = ' viewBox="' in svg
+        optimized = re.sub(r'<([a-zA-Z]\w*)((?:\s+[^\s=]+="[^"]*")*)\s*(/?)>',
+                           self._optimize_tag,
+                           svg)
+        if 'url(#border_clip)' not in optimized:
+            optimized = re.sub(r'<clipPath id="border_clip">.*?</clipPath>',
+                               '',
+                               optimized)
+            optimized = optimized.replace('<defs></defs>', '')
+        if 'ev:' not in optimized.replace('xmlns:ev=', ''):
+            optimized = optimized.replace(
+                ' xmlns:ev="http://www.w3.org/2001/xml-events"',
+                '')
+        if 'xlink:' not in optimized.replace('xmlns:xlink=', ''):
+            optimized = optimized.replace(
+                ' xmlns:xlink="http://www.w3.org/1999/xlink"',
+                '')
+        self.original_size += len(svg.encode('utf-8'))
+        self.optimized_size += len(optimized.encode('utf-8'))
+        return optimized
+
+    def _optimize_tag(self, match):
+        tag_name, attributes, closing = match.groups()
+        parts = ['<', tag_name]
+        for name, value in re.findall(r'([^\s=]+)="([^"]*)"', attributes):
+            if name in self.NUMBER_ATTRIBUTES:
+                if name == 'd':
+                    value = self._optimize_path(value)
+                else:
+                    value = self._optimize_numbers(value)
+            if (name, value) in self.DEFAULT_ATTRIBUTES and not (
+                    name == 'clip-path' and self._has_viewbox):
+                continue
+            if name == 'stroke-linecap' and tag_name == 'polygon':
+                continue  # No ends, so no caps.
+            parts.append(' {}="{}"'.format(name, value))
+        parts.append(closing)
+        parts.append('>')
+        return ''.join(parts)
+
+    def _format_number(self, number):
+        text = '{:.{}f}'.format(round(float(number), self.precision),
+                                self.precision)
+        if '.' in text:
+            text = text.rstrip('0').rstrip('.')
+        return '0' if text == '-0' else text
+
+    def _optimize_numbers(self, text):
+        return re.sub(self.NUMBER_PATTERN,
+                      lambda match: self._format_number(match.group()),
+                      text)
+
+    def _format_arguments(self, numbers):
+        text = ' '.join(self._format_number(number) for number in numbers)
+        return text.replace(' -', '-')
+
+    def _optimize_path(self, d):
+        commands = []  # [(letter, [number])]
+        for token in re.findall(r'[a-zA-Z]|' + self.NUMBER_PATTERN, d):
+            if token.isalpha():
+                commands.append((token, []))
+            elif not commands:
+                return self._optimize_numbers(d)
+            else:
+                commands[-1][1].append(float(token))
+        if any(self.PATH_ARGUMENT_COUNTS.get(letter) != len(arguments)
+               for letter, arguments in commands):
+            # Only absolute commands that SvgTurtle writes are converted.
+            return self._optimize_numbers(d)
+        x = y = start_x = start_y = 0
+        last_letter = None
+        parts = []
+        for letter, arguments in commands:
+            if letter == 'Z':
+                parts.append('z')
+                last_letter = 'z'
+                x, y = start_x, start_y
+                continue
+            end_x = round(arguments[-2], self.precision)
+            end_y = round(arguments[-1], self.precision)
+            text = self._format_arguments(arguments[:-2] + [end_x, end_y])
+            if self.relative_paths:
+                relative_text = self._format_arguments(
+                    arguments[:-2] + [end_x - x, end_y - y])
+                if len(relative_text) < len(text):
+                    letter = letter.lower()
+                    text = relative_text
+            if letter == last_letter and letter not in 'Mm':
+                # Repeated command, so the letter can be left out.
+                parts.append(text if text.startswith('-') else ' ' + text)
+            else:
+                parts.append(letter + text)
+            last_letter = letter
+            x, y = end_x, end_y
+            if letter in 'Mm':
+                start_x, start_y = x, y
+        return ''.join(parts)
+
+
+def save_svg(file_path, width, height, draw, *args) -> SvgOptimizer:
+    """ Draw one SVG file with a new turtle, as a job for run_jobs().
+
+    :param draw: a module-level function to call with the turtle and args
+    :return: the optimizer that shrank the file, to add to a report
+    """
+    optimizer = SvgOptimizer()
+    turtle = SvgTurtle.create(width, height)
+    draw(turtle, *args)
+    turtle.save_as(file_path, optimizer=optimizer)
+    return optimizer
+
+
+def _svg_start_tag(width, height):
+    """ Start an SVG document with the same attributes as svgwrite. """
+    from xml.sax.saxutils import quoteattr
+
+    return ('<?xml version="1.0" encoding="utf-8" ?>\n'
+            '<svg baseProfile="full" height={} version="1.1" '
+            'width={} xmlns="http://www.w3.org/2000/svg" '
+            'xmlns:ev="http://www.w3.org/2001/xml-events" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink">'.format(
+                quoteattr(str(height)),
+                quoteattr(str(width))))
+
+
+def _points_str(points):
+    return ' '.join('{},{}'.format(x, y) for x, y in points)
+
+
+@lru_cache(maxsize=1024)
+def rgb_to_hex(r, g, b):
+    """ Convert colour components from 0.0 to 1.0 into a hex colour string.
+
+    Results are cached, because colour maps tend to repeat the same colours.
+    Check rgb_to_hex.cache_info() for the hit rate.
+    """
+    r, g, b = [round(255.0*x) for x in (r, g, b)]
+    if not ((0 <= r <= 255) and (0 <= g <= 255) and (0 <= b <= 255)):
+        return '#000000'
+    return "#%02x%02x%02x" % (r, g, b)
+
+
+@lru_cache(maxsize=1024)
+def hex_to_rgb(colorstr):
+    """ Convert a colour string from a turtle's primitives to red, green,
+    and blue.
+
+    :return: (r, g, b), each from 0.0 to 1.0. Black, if the string isn't
+        recognized.
+    """
+    colorstr = color_map.get(colorstr.lower(), colorstr)
+    if not re.fullmatch(r'#[0-9a-fA-F]{6}', colorstr):
+        return 0.0, 0.0, 0.0
+    return tuple(int(colorstr[i:i+2], 16) / 255 for i in (1, 3, 5))
+
+
+# fill and stroke are (r, g, b), or None if they aren't painted. See
+# find_paint().
+Paint = namedtuple('Paint',
+                   'fill stroke stroke_width linecap linejoin even_odd')
+
+
+def find_paint(kind,
+               fill='#000000',
+               fill_rule='nonzero',
+               stroke='none',
+               stroke_width=1,
+               stroke_linecap='butt',
+               stroke_linejoin='miter') -> Paint:
+    """ Apply SVG's presentation rules to a primitive's style.
+
+    The defaults match SVG's defaults, so turtles that don't write SVG can
+    paint the same pixels for the same primitive.
+    :param kind: the primitive's kind, because lines are never filled
+    :return: how to fill and stroke the primitive's path
+    """
+    is_filled = fill != 'none' and kind != 'line'
+    is_stroked = stroke != 'none' and stroke_width
+    return Paint(hex_to_rgb(fill) if is_filled else None,
+                 hex_to_rgb(stroke) if is_stroked else None,
+                 stroke_width,
+                 stroke_linecap,
+                 stroke_linejoin,
+                 fill_rule == 'evenodd')
+
+
+def trace_segments(path, segments):
+    """ Add connected segments to a path.
+
+    :param path: a cairo context, or anything with the same move_to(),
+        line_to(), arc(), arc_negative(), and close_path() methods
+    :param segments: the geometry of a line or shape primitive
+    """
+    start = segments[0][:2]
+    path.move_to(*start)
+    for segment in segments:
+        if segment.arc is None:
+            path.line_to(segment.x2, segment.y2)
+            continue
+        radius, sweep_flag = segment.arc
+        x, y = _arc_centre(*segment[:4], radius, sweep_flag)
+        start_angle = math.atan2(segment.y1 - y, segment.x1 - x)
+        end_angle = math.atan2(segment.y2 - y, segment.x2 - x)
+        if sweep_flag:
+            path.arc(x, y, radius, start_angle, end_angle)
+        else:
+            path.arc_negative(x, y, radius, start_angle, end_angle)
+    if segments[-1][2:4] == start:
+        path.close_path()
+
+
+def _arc_centre(x1, y1, x2, y2, radius, sweep_flag):
+    """ Find the centre of an SVG arc that is less than a half circle.
+
+    SVG's y axis points down, so sweep_flag 1 means clockwise on the screen.
+    """
+    dx = (x2 - x1) / 2
+    dy = (y2 - y1) / 2
+    half_chord = math.hypot(dx, dy)
+    if not half_chord:
+        return x1, y1
+    offset = math.sqrt(max(radius*radius - half_chord*half_chord, 0))
+    offset /= half_chord
+    if not sweep_flag:
+        offset = -offset
+    return x1 + dx - dy*offset, y1 + dy + dx*offset
+
+
+def _primitive_bounds(primitive):
+    """ Find (left, top, right, bottom) of a primitive on the canvas. """
+    kind, geometry, style = primitive
+    xs = []
+    ys = []
+    if kind in ('line', 'shape'):
+        for segment in geometry:
+            xs.append(segment.x1)
+            xs.append(segment.x2)
+            ys.append(segment.y1)
+            ys.append(segment.y2)
+            if segment.arc is not None:
+                _add_arc_extremes(segment, xs, ys)
+        if style.get('stroke', 'none') == 'none':
+            margin = 0
+        else:
+            margin = style.get('stroke_width', 1) / 2
+    elif kind == 'dot':
+        x, y, diameter = geometry
+        xs.append(x)
+        ys.append(y)
+        margin = diameter/2 + style.get('stroke_width', 1)/2
+    elif kind == 'stamp':
+        x, y, heading, scale = geometry
+        cos_scale = math.cos(math.radians(heading)) * scale
+        sin_scale = math.sin(math.radians(heading)) * scale
+        for dx, dy in SvgTurtle._STAMP_POINTS:
+            xs.append(x + dx*cos_scale + dy*sin_scale)
+            ys.append(y - dx*sin_scale + dy*cos_scale)
+        margin = scale / 2
+    else:
+        # Guess at the text size from typical letter proportions.
+        text, x, y, align, font = geometry
+        font_size = font[1] * 1.65
+        width = len(text) * font_size * 0.6
+        x -= dict(left=0, center=width/2, right=width)[align]
+        xs.extend((x, x + width))
+        ys.extend((y - font_size*0.8, y + font_size*0.2))
+        margin = 0
+    return (min(xs) - margin,
+            min(ys) - margin,
+            max(xs) + margin,
+            max(ys) + margin)
+
+
+def _add_arc_extremes(segment, xs, ys):
+    """ Add the points where an arc segment crosses its centre's axes. """
+    radius, sweep_flag = segment.arc
+    x, y = _arc_centre(*segment[:4], radius, sweep_flag)
+    start_angle = math.atan2(segment.y1 - y, segment.x1 - x)
+    end_angle = math.atan2(segment.y2 - y, segment.x2 - x)
+    if not sweep_flag:
+        start_angle, end_angle = end_angle, start_angle
+    extent = (end_angle - start_angle) % (2*math.pi)
+    for quarter in range(4):
+        angle = quarter * math.pi / 2
+        if (angle - start_angle) % (2*math.pi) <= extent:
+            xs.append(x + radius*math.cos(angle))
+            ys.append(y + radius*math.sin(angle))
+
+
 def _parse_int(s):
     """ Parse an integer from the start of a string, ignore anything else. """
     match = re.match(r'\d+', s)
@@ -1021,3 +2651,6 @@ color_map = {
     'yellow4': '#8b8b00',
     'yellowgreen': '#9acd32',
 }
+
+# {code: name} for reverse lookups, using the first name for each code.
+color_names = {code: name for name, code in reversed(color_map.items())}
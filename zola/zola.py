@@ -3,8 +3,8 @@ import math
 from pathlib import Path
 from turtle import Turtle
 
-from cairosvg import svg2png
-from matplotlib import pyplot as plt
+from quarto.palette import get_palette
+from quarto.build_cache import svg_build
 from quarto.svg_turtle import SvgTurtle
 
 
@@ -24,7 +24,7 @@ class ZolaBoard:
                    ('inferno', 0, 1),
                    ('Pastel1', 0, 1)]
         map_name, self.min_colour, self.max_colour = schemes[0]
-        self.cm = plt.get_cmap(map_name)
+        self.cm = get_palette(map_name)
 
     def draw(self):
         t = self.turtle
@@ -76,8 +76,7 @@ class ZolaBoard:
         colour_point = (level *
                         (self.max_colour - self.min_colour) +
                         self.min_colour)
-        colour = self.cm(colour_point)
-        rgb_colour = colour[:3]
+        rgb_colour = self.cm(colour_point)
         if is_light:
             self.turtle.color('gray70')
         else:
@@ -116,23 +115,26 @@ def demo():
 
 def main():
     output_path = Path(__file__).parent
-    board_path = output_path / 'zola_board.svg'
-    size = 170
-    turtle = SvgTurtle.create("172px", "172px")
-    # noinspection PyTypeChecker
-    board = ZolaBoard(turtle, 6, size)
-    board.draw()
-    turtle.save_as(board_path)
+    with svg_build(output_path, main, get_palette) as (cache, optimizer):
+        board_path = output_path / 'zola_board.svg'
+        size = 170
+        if cache.needs_build(board_path, 6, size):
+            turtle = SvgTurtle.create("172px", "172px")
+            # noinspection PyTypeChecker
+            board = ZolaBoard(turtle, 6, size)
+            board.draw()
+            turtle.save_as(board_path, optimizer=optimizer)
 
-    icon_svg_path = output_path / 'zola_icon.svg'
-    icon_png_path = output_path / 'zola_icon.png'
-    size = 30
-    turtle = SvgTurtle.create("32px", "32px")
-    # noinspection PyTypeChecker
-    board = ZolaBoard(turtle, 2, size, -0.5)
-    board.draw()
-    turtle.save_as(icon_svg_path)
-    svg2png(icon_svg_path.read_text(), write_to=str(icon_png_path))
+        icon_svg_path = output_path / 'zola_icon.svg'
+        icon_png_path = output_path / 'zola_icon.png'
+        size = 30
+        if cache.needs_build([icon_svg_path, icon_png_path], size):
+            turtle = SvgTurtle.create("32px", "32px")
+            # noinspection PyTypeChecker
+            board = ZolaBoard(turtle, 2, size, -0.5)
+            board.draw()
+            turtle.save_as(icon_svg_path, optimizer=optimizer)
+            turtle.to_png(write_to=str(icon_png_path))
 
 
 if __name__ == '__main__':